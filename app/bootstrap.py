@@ -0,0 +1,47 @@
+# app/bootstrap.py
+"""One-time database setup, safe to run from several processes at once."""
+import os
+
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app.db import SessionLocal, engine, sync_schema
+from app import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.utils import category_totals, jobs, ledger, search
+
+SCHEMA_LOCK_ID = 0x67726F77  # arbitrary key for pg_advisory_lock
+
+# set by app.serve once the master process has prepared the schema
+SKIP_ENV = "GROWAI_SKIP_SCHEMA"
+
+
+def init_db(bind=engine, reset_jobs: bool = True) -> None:
+    if bind.dialect.name == "postgresql":
+        # workers starting together queue on the lock instead of racing CREATE TABLE
+        with bind.connect() as conn:
+            conn.exec_driver_sql(f"SELECT pg_advisory_lock({SCHEMA_LOCK_ID})")
+            try:
+                _setup(bind, reset_jobs)
+            finally:
+                conn.exec_driver_sql(f"SELECT pg_advisory_unlock({SCHEMA_LOCK_ID})")
+                conn.commit()
+        return
+    try:
+        _setup(bind, reset_jobs)
+    except (OperationalError, ProgrammingError):
+        # another process created the same table/index between our check and CREATE
+        _setup(bind, reset_jobs)
+
+
+def _setup(bind, reset_jobs: bool) -> None:
+    sync_schema(bind)
+    search.ensure_index(bind)
+    with SessionLocal(bind=bind) as db:
+        ledger.ensure_built(db)
+        category_totals.ensure_built(db)
+        if reset_jobs:
+            jobs.mark_interrupted(db)   # owned by a process that stopped heartbeating
+
+
+def init_db_once() -> None:
+    if os.getenv(SKIP_ENV) != "1":
+        init_db()
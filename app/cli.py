@@ -0,0 +1,219 @@
+# app/cli.py
+"""Maintenance commands: ``python -m app.cli <command>``."""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from sqlalchemy import select
+
+from app.db import SessionLocal, current_tenant
+from app import models
+from app.utils import archive, backtest, category_totals, holt_state, ledger, sketches, stock, tenancy
+
+
+def init_db(args) -> None:
+    # with --tenant the shop was already created and initialized when it was opened
+    if not args.tenant:
+        from app.bootstrap import init_db
+        init_db()
+    print(f"schema ready for {args.tenant or 'the default database'}")
+
+
+def rebuild_ledger(args) -> None:
+    with SessionLocal() as db:
+        n = ledger.rebuild(db)
+    print(f"rebuilt balances for {n} customers")
+
+
+def rebuild_category_totals(args) -> None:
+    with SessionLocal() as db:
+        n = category_totals.rebuild(db)
+    print(f"rebuilt {n} category/day totals")
+
+
+def refit_holt(args) -> None:
+    with SessionLocal() as db:
+        n = holt_state.refit(db, args.product)
+    print(f"refitted forecast state for {n} products")
+
+
+def run_backtest(args) -> None:
+    with SessionLocal() as db:
+        series = backtest.load_series(db, args.model, args.product)
+    t0 = time.perf_counter()
+    result = backtest.run(series, args.model, args.horizon, args.min_train, args.workers)
+    fmt = "{:>10}  {:>8}  {:>10.3f}  {:>8}  {:>10.3f}"
+    print("{:>10}  {:>8}  {:>10}  {:>8}  {:>10}".format("product", "n", "mae", "mape%", "bias"))
+    for row in result["products"]:
+        mape = "-" if row["mape"] is None else f"{row['mape']:.1f}"
+        print(fmt.format(row["product_id"], row["n"], row["mae"], mape, row["bias"]))
+    agg = result["aggregate"]
+    mape = "-" if agg["mape"] is None else f"{agg['mape']:.1f}"
+    print(fmt.format("ALL", agg["n"], agg["mae"], mape, agg["bias"]))
+    print(f"{len(result['products'])} products in {time.perf_counter() - t0:.1f} s")
+
+
+def check_heavy_hitters(args) -> None:
+    # replay every sale through a sketch the way live updates do, then hold it to the exact totals
+    s = models.Sale
+    sketch = sketches.SpaceSaving(args.k)
+    exact = {}
+    with SessionLocal() as db:
+        for pid, revenue in db.execute(select(s.product_id, s.qty * s.unit_price).order_by(s.id)).yield_per(50_000):
+            sketch.add(pid, float(revenue))
+            exact[pid] = exact.get(pid, 0.0) + float(revenue)
+    failures = 0
+    for pid, est, err in sketch.top(args.limit):
+        true = exact[pid]
+        ok = est - err - 1e-6 <= true <= est + 1e-6
+        failures += not ok
+        print(f"{pid:>10}  est {est:14.2f}  exact {true:14.2f}  err<= {err:12.2f}  {'ok' if ok else 'FAIL'}")
+    threshold = sketch.total / args.k
+    missing = [pid for pid, v in exact.items() if v > threshold and pid not in sketch.counts]
+    if missing:
+        print(f"products above total/k missing from the sketch: {missing}")
+    if failures or missing:
+        sys.exit(1)
+
+
+def archive_sales(args) -> None:
+    with SessionLocal() as db:
+        months = archive.run(db, args.keep_months, args.dir)
+        for am in months:
+            print(f"{am.month}: {am.rows} sales, {am.revenue:.2f} revenue -> {am.path}")
+    print(f"archived {len(months)} months (keeping {args.keep_months})")
+
+
+def stock_snapshot(args) -> None:
+    with SessionLocal() as db:
+        snap = stock.take_snapshot(db)
+    print(f"snapshot #{snap.id}: {snap.products} products up to movement {snap.last_movement_id} ({len(snap.data)} bytes)")
+
+
+def import_costs(module: str, lazy: bool, code: str = "") -> tuple:
+    """Cumulative ms per module from ``python -X importtime -c "import <module>; <code>"``, and stdout.
+
+    Raises ``RuntimeError`` with the child's last error line if the import fails.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}; {code}"],
+        capture_output=True, text=True, env={**os.environ, "LAZY_ROUTERS": "1" if lazy else "0"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    cost = {}
+    for line in proc.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                cost[name.strip()] = int(cumulative) / 1000
+    return cost, proc.stdout
+
+
+def importtime(args) -> None:
+    # cumulative import cost of the module as reported by `python -X importtime`
+    try:
+        cost, _ = import_costs(args.module, args.lazy)
+    except RuntimeError as e:
+        sys.exit(str(e))
+    total = cost.get(args.module, 0.0)
+    for name, ms in sorted(cost.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"{ms:9.1f} ms  {name}")
+    print(f"{args.module}: {total:.1f} ms (budget {args.budget_ms} ms)")
+    if total > args.budget_ms:
+        sys.exit(1)
+
+
+def startup(args) -> None:
+    # wall time from spawning uvicorn until /health answers
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "LAZY_ROUTERS": "1" if args.lazy else "0"},
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    break
+            except OSError:
+                if proc.poll() is not None or time.perf_counter() - t0 > 60:
+                    sys.exit("server did not become healthy")
+                time.sleep(0.01)
+        elapsed = (time.perf_counter() - t0) * 1000
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"/health after {elapsed:.0f} ms (budget {args.budget_ms} ms)")
+    if elapsed > args.budget_ms:
+        sys.exit(1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("--tenant", default=None, help="run against this shop's database, creating it if new (TENANCY=1)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("init-db", help="create or update the schema (with --tenant: provision that shop)")
+    p.set_defaults(func=init_db)
+
+    p = sub.add_parser("rebuild-ledger", help="recompute customer balances from dues")
+    p.set_defaults(func=rebuild_ledger)
+
+    p = sub.add_parser("rebuild-category-totals", help="recompute category revenue per day from sales")
+    p.set_defaults(func=rebuild_category_totals)
+
+    p = sub.add_parser("refit-holt", help="rebuild incremental forecast state from sales history")
+    p.add_argument("--product", type=int, default=None, help="only this product id")
+    p.set_defaults(func=refit_holt)
+
+    p = sub.add_parser("backtest", help="rolling-origin evaluation of a forecast model")
+    p.add_argument("--model", choices=backtest.MODELS, default="holt")
+    p.add_argument("--horizon", type=int, default=7)
+    p.add_argument("--min-train", type=int, default=28)
+    p.add_argument("--product", type=int, action="append", help="restrict to product id (repeatable)")
+    p.add_argument("--workers", type=int, default=None, help="process pool size (default: CPU count)")
+    p.set_defaults(func=run_backtest)
+
+    p = sub.add_parser("check-heavy-hitters", help="verify the top-products sketch error bound against SQL")
+    p.add_argument("--k", type=int, default=sketches.HEAVY_HITTERS_K)
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=check_heavy_hitters)
+
+    p = sub.add_parser("archive", help="move sales older than the retention window to compressed files")
+    p.add_argument("--keep-months", type=int, default=archive.ARCHIVE_KEEP_MONTHS)
+    p.add_argument("--dir", default=None, help=f"default: {archive.ARCHIVE_DIR} (/<tenant> with --tenant)")
+    p.set_defaults(func=archive_sales)
+
+    p = sub.add_parser("stock-snapshot", help="store the current stock of all products (run periodically)")
+    p.set_defaults(func=stock_snapshot)
+
+    p = sub.add_parser("importtime", help="fail if importing the app exceeds a time budget")
+    p.add_argument("--module", default="app.main")
+    p.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    p.add_argument("--lazy", action="store_true", help="measure with LAZY_ROUTERS=1")
+    p.add_argument("--top", type=int, default=10)
+    p.set_defaults(func=importtime)
+
+    p = sub.add_parser("startup", help="fail if /health takes too long to answer after process start")
+    p.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_BUDGET_MS", "3000")))
+    p.add_argument("--lazy", action="store_true", help="measure with LAZY_ROUTERS=1")
+    p.set_defaults(func=startup)
+
+    args = parser.parse_args(argv)
+    if args.tenant:
+        tenant = tenancy.engines.acquire(args.tenant, create=True)
+        current_tenant.set(tenant)
+        SessionLocal.configure(bind=tenant.engine)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,75 @@
 import os
-from sqlalchemy import create_engine
+from contextvars import ContextVar
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///D:/GrowAi/growai.db")
 
-# sqlite + Windows + threadsafe
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-    future=True,
-)
+def make_engine(url: str, pool_size: int = None, max_overflow: int = None):
+    # sqlite + Windows + threadsafe; server databases get a sized, self-healing pool per worker
+    if url.startswith("sqlite"):
+        engine_options = {"connect_args": {"check_same_thread": False}}
+    else:
+        engine_options = {
+            "pool_size": pool_size or int(os.getenv("DB_POOL_SIZE", "5")),
+            "max_overflow": max_overflow if max_overflow is not None else int(os.getenv("DB_MAX_OVERFLOW", "10")),
+            "pool_pre_ping": True,
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        }
+    return create_engine(url, future=True, **engine_options)
+
+engine = make_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
+# the shop a request or job is running for (set by app.utils.tenancy); None: the default database
+current_tenant: ContextVar = ContextVar("current_tenant", default=None)
+
+def current_engine():
+    tenant = current_tenant.get()
+    return tenant.engine if tenant is not None else engine
+
 def get_db():
-    db = SessionLocal()
+    db = SessionLocal(bind=current_engine())
     try:
         yield db
     finally:
         db.close()
+
+# indexes removed from the models, dropped from existing databases
+DROPPED_INDEXES = {
+    "sales": ("ix_sales_created_at",),      # covered by ix_sales_created_product_qty
+}
+
+def sync_schema(bind=engine):
+    """create_all, plus ADD COLUMN / CREATE INDEX for what was added to existing tables,
+    and DROP INDEX for ``DROPPED_INDEXES``."""
+    Base.metadata.create_all(bind=bind)
+    insp = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in columns:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col.type.compile(bind.dialect)}"
+                if col.default is not None and col.default.is_scalar:
+                    ddl += f" DEFAULT {col.default.arg!r}"
+                if not col.nullable:
+                    ddl += " NOT NULL"
+                conn.exec_driver_sql(ddl)
+            indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn, checkfirst=True)
+            for name in DROPPED_INDEXES.get(table.name, ()):
+                if name in indexes:
+                    conn.exec_driver_sql(f"DROP INDEX {name}")
+
+def upsert_insert(db):
+    """Dialect INSERT supporting ON CONFLICT (SQLite/Postgres), or None elsewhere."""
+    return {"sqlite": sqlite_insert, "postgresql": pg_insert}.get(db.get_bind().dialect.name)
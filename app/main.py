@@ -1,11 +1,53 @@
+import importlib
+import os
+import sys
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from app.routers import products, dues, sales, stock, jobs
+from app.utils import tenancy
+
+# Heavy routers (forecasting, report aggregations) can be imported on first use
+# so a cold process answers /health as soon as possible.
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "0") == "1"
+_LAZY = {
+    "/api/v1/forecast": "app.routers.forecast",
+    "/api/v1/reports": "app.routers.reports",
+}
+_lazy_lock = threading.Lock()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # DB init (no-op in workers started by `python -m app.serve`, which runs it once up front)
+    from app.bootstrap import init_db_once
+    from app.db import SessionLocal
+    from app.utils import demand, rolling, sketches
 
-from app.db import Base, engine
-from app import models
-from app.routers import products, dues, forecast, reports, sales  # ← ensure sales is imported
+    init_db_once()
+    if rolling.ROLLING_WINDOW:
+        with SessionLocal() as db:
+            rolling.start(db)
+    if sketches.HEAVY_HITTERS:
+        with SessionLocal() as db:
+            sketches.start(db)
+    if demand.DEMAND_STATS:
+        with SessionLocal() as db:
+            demand.start(db)
+    yield
+    from app.utils import group_commit, jobs
+    group_commit.shutdown()
+    jobs.shutdown()
+    if "app.utils.backtest" in sys.modules:     # only imported once a backtest ran
+        sys.modules["app.utils.backtest"].shutdown()
+    tenancy.engines.close_all()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 # 🔐 CORS – allow your LAN dev origins and make preflight succeed
 origins = [
@@ -14,6 +56,10 @@ origins = [
     "http://192.168.0.103:3000",   # ← your device’s frontend URL
 ]
 
+# added first so CORS stays outermost: preflights and 400 "Missing tenant" responses get CORS headers
+if tenancy.TENANCY:
+    app.add_middleware(tenancy.TenantMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,         # or use allow_origin_regex=".*" for dev
@@ -22,12 +68,55 @@ app.add_middleware(
     allow_headers=["*"],           # ← allow Content-Type, etc
 )
 
-# DB init
-models.Base.metadata.create_all(bind=engine)
+
+@app.get("/health")
+def health(): return {"ok": True}
+
+
+@app.get("/ready")
+async def ready():
+    # DB round trip, pool and threadpool saturation; 503 takes the worker out of rotation
+    from app.utils import readiness
+
+    ok, body = await readiness.probe()
+    return JSONResponse(body, status_code=200 if ok else 503)
+
+
+def _include(module_name: str) -> None:
+    app.include_router(importlib.import_module(module_name).router)
+    app.openapi_schema = None  # regenerate docs with the new routes
+
+
+class LazyRouterMiddleware:
+    """Includes a deferred router the first time a request hits its prefix."""
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if _LAZY and scope["type"] == "http":
+            path = scope["path"]
+            if path in ("/docs", "/openapi.json"):
+                prefixes = list(_LAZY)
+            else:
+                prefixes = [p for p in _LAZY if path.startswith(p)]
+            for prefix in prefixes:
+                with _lazy_lock:
+                    module_name = _LAZY.pop(prefix, None)
+                    if module_name:
+                        _include(module_name)
+        await self.app(scope, receive, send)
+
 
 # 🔌 Mount all routers (including sales!)
 app.include_router(products.router)
 app.include_router(dues.router)
-app.include_router(forecast.router)
-app.include_router(reports.router)
 app.include_router(sales.router)    # ← do NOT forget this
+app.include_router(stock.router)
+app.include_router(jobs.router)
+if LAZY_ROUTERS:
+    app.add_middleware(LazyRouterMiddleware)
+else:
+    for _module in _LAZY.values():
+        _include(_module)
+    _LAZY.clear()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, REAL, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, REAL, Boolean, ForeignKey, Date, DateTime, Index, LargeBinary, Text, func
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -26,11 +26,102 @@ class Sale(Base):
 
     product = relationship("Product", back_populates="sales")
 
+    __table_args__ = (
+        # every created_at range seeks here; demand (utils/demand.py) also reads product and qty from it
+        Index("ix_sales_created_product_qty", "created_at", "product_id", "qty"),
+    )
+
+class StockMovement(Base):
+    # append-only: every change to Product.stock, so past inventory can be rebuilt
+    __tablename__ = "stock_movements"
+    id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, nullable=False, index=True)
+    delta = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)               # initial | sale | adjustment | restock
+    ref_id = Column(Integer, nullable=True)             # sale id for kind="sale"
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+
+class StockSnapshot(Base):
+    # stock of every product after movement `last_movement_id`, zlib-packed (see utils/stock.py)
+    __tablename__ = "stock_snapshots"
+    id = Column(Integer, primary_key=True)
+    taken_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    last_movement_id = Column(Integer, nullable=False, default=0)
+    products = Column(Integer, nullable=False, default=0)
+    data = Column(LargeBinary, nullable=False)
+
+class SaleDaily(Base):
+    # rollup of archived sales, so reports still see months moved out of `sales`
+    __tablename__ = "sales_daily"
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True, index=True)
+    qty = Column(Integer, nullable=False, default=0)
+    revenue = Column(REAL, nullable=False, default=0.0)
+
+class CategoryDaily(Base):
+    # revenue per day and category, maintained with every sale and category change (utils/category_totals.py)
+    __tablename__ = "category_daily"
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    qty = Column(Integer, nullable=False, default=0)
+    revenue = Column(REAL, nullable=False, default=0.0)
+
+class ArchivedMonth(Base):
+    __tablename__ = "archived_months"
+    month = Column(String, primary_key=True)            # "YYYY-MM"
+    rows = Column(Integer, nullable=False, default=0)
+    revenue = Column(REAL, nullable=False, default=0.0)
+    path = Column(String, nullable=False)               # last archive file written for the month
+    archived_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
 class Due(Base):
     __tablename__ = "dues"
     id = Column(Integer, primary_key=True, index=True)
     customer_name = Column(String, nullable=False)
     amount = Column(REAL, nullable=False)
+    paid = Column(REAL, default=0.0, nullable=False)       # partial payments so far
     note = Column(String, nullable=True)
     is_settled = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_dues_customer_created", "customer_name", "created_at"),
+        Index("ix_dues_created", "created_at"),     # newest dues for the activity feed
+        # aging report: seeks on (is_settled, created_at), the trailing columns make it covering
+        Index("ix_dues_settled_created", "is_settled", "created_at", "customer_name", "amount", "paid"),
+    )
+
+class CustomerBalance(Base):
+    # materialized per-customer outstanding balance, maintained alongside dues
+    __tablename__ = "customer_balances"
+    customer_name = Column(String, primary_key=True)
+    balance = Column(REAL, default=0.0, nullable=False, index=True)
+    open_dues = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class ForecastState(Base):
+    # Holt level/trend per product, advanced by one step per recorded sale
+    __tablename__ = "forecast_states"
+    product_id = Column(Integer, primary_key=True)
+    level = Column(REAL, nullable=False, default=0.0)
+    trend = Column(REAL, nullable=False, default=0.0)
+    n = Column(Integer, nullable=False, default=0)     # observations folded in so far
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+class Job(Base):
+    # background work submitted through /api/v1/jobs (see utils/jobs.py)
+    __tablename__ = "jobs"
+    id = Column(String, primary_key=True)                 # uuid4 hex
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued|running|succeeded|failed|interrupted
+    progress = Column(REAL, nullable=False, default=0.0)
+    message = Column(String, nullable=True)
+    params = Column(Text, nullable=False, default="{}")   # JSON
+    result = Column(Text, nullable=True)                  # JSON, once succeeded
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    owner = Column(String, nullable=True)                  # host:pid:nonce of the process running it
+    heartbeat_at = Column(DateTime, nullable=True)         # UTC, refreshed while queued or running
@@ -1,5 +1,19 @@
-from .products import router as products_router
-from .sales import router as sales_router
-from .dues import router as dues_router
-from .forecast import router as forecast_router
-from .reports import router as reports_router
+# Routers are resolved on attribute access so importing one of them (or the
+# package) doesn't pull in every other router and its dependencies.
+import importlib
+
+_ROUTERS = {
+    "products_router": ".products",
+    "sales_router": ".sales",
+    "dues_router": ".dues",
+    "stock_router": ".stock",
+    "jobs_router": ".jobs",
+    "forecast_router": ".forecast",
+    "reports_router": ".reports",
+}
+
+
+def __getattr__(name):
+    if name in _ROUTERS:
+        return importlib.import_module(_ROUTERS[name], __name__).router
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import and_, bindparam, case, func, select, update
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models, schemas
+from app.utils import idempotency, ledger
 
 router = APIRouter(prefix="/api/v1/dues", tags=["dues"])
 
+_EPS = 1e-6  # float slack when deciding a due is fully paid
+
 @router.get("/", response_model=list[schemas.DueOut])
 def list_dues(db: Session = Depends(get_db)):
     return (
@@ -14,15 +21,196 @@ def list_dues(db: Session = Depends(get_db)):
     )
 
 @router.post("/", response_model=schemas.DueOut)
-def create_due(body: schemas.DueCreate, db: Session = Depends(get_db)):
-    d = models.Due(**body.model_dump(), is_settled=False)
-    db.add(d); db.commit(); db.refresh(d)
-    return d
+def create_due(
+    body: schemas.DueCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+):
+    def create():
+        d = models.Due(**body.model_dump(), is_settled=False)
+        db.add(d)
+        ledger.apply_due(db, d.customer_name, d.amount, 1)
+        db.commit(); db.refresh(d)
+        return schemas.DueOut.model_validate(d)
+    return idempotency.run("dues", idempotency_key, body, create)
+
+@router.get("/top-debtors", response_model=list[schemas.CustomerBalanceOut])
+def top_debtors(limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)):
+    return (
+        db.query(models.CustomerBalance)
+        .filter(models.CustomerBalance.balance > 0)
+        .order_by(models.CustomerBalance.balance.desc())
+        .limit(limit)
+        .all()
+    )
+
+_BUCKETS = ("days_0_30", "days_31_60", "days_61_90", "days_90_plus", "total", "open_dues")
+
+def _aging_sums(now: datetime) -> list:
+    d = models.Due
+    owed = d.amount - d.paid
+    edges = [now - timedelta(days=n) for n in (30, 60, 90)]
+
+    def bucket(cond):
+        return func.sum(case((cond, owed), else_=0.0))
+
+    return [
+        bucket(d.created_at > edges[0]),
+        bucket(and_(d.created_at <= edges[0], d.created_at > edges[1])),
+        bucket(and_(d.created_at <= edges[1], d.created_at > edges[2])),
+        bucket(d.created_at <= edges[2]),
+        func.sum(owed),
+        func.count(d.id),
+    ]
+
+@router.get("/aging", response_model=schemas.DuesAgingOut)
+def dues_aging(
+    as_of: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    # one pass over unsettled dues through ix_dues_settled_created (covering): per-customer buckets,
+    # with the grand totals and customer count computed over the groups by window functions
+    d = models.Due
+    now = as_of or datetime.now()
+    scope = (d.is_settled.is_(False), d.created_at <= now)
+    sums = _aging_sums(now)
+    per_customer = [e.label(n) for e, n in zip(sums, _BUCKETS)]
+    grand = [func.sum(e).over().label(f"all_{n}") for e, n in zip(sums, _BUCKETS)]
+    rows = db.execute(
+        select(d.customer_name, *per_customer, *grand, func.count().over().label("customers_total"))
+        .where(*scope)
+        .group_by(d.customer_name)
+        .order_by(sums[4].desc(), d.customer_name)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+    if rows:
+        totals = {n: getattr(rows[0], f"all_{n}") for n in _BUCKETS}
+        customers_total = rows[0].customers_total
+    else:   # page past the end: the window values came with no row
+        r = db.execute(select(*sums, func.count(func.distinct(d.customer_name))).where(*scope)).one()
+        totals = {n: v or 0 for n, v in zip(_BUCKETS, r)}
+        customers_total = r[-1]
+    return {
+        "as_of": now,
+        "totals": totals,
+        "customers_total": customers_total,
+        "customers": [{"customer_name": r.customer_name, **{n: getattr(r, n) for n in _BUCKETS}} for r in rows],
+    }
+
+@router.get("/customers/{name}", response_model=schemas.CustomerBalanceOut)
+def customer_balance(name: str, db: Session = Depends(get_db)):
+    cb = db.get(models.CustomerBalance, name)
+    if not cb: raise HTTPException(404, "Customer not found")
+    return cb
+
+@router.get("/customers/{name}/history", response_model=list[schemas.DueOut])
+def customer_history(
+    name: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    return (
+        db.query(models.Due)
+        .filter(models.Due.customer_name == name)
+        .order_by(models.Due.created_at.desc(), models.Due.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+def _lock_dues(db: Session, *where) -> None:
+    """Hold the matching dues until commit, so a settle reads and writes them without interleaving.
+
+    Postgres locks the rows. SQLite has no row locks, but any write takes the
+    database write lock for the rest of the transaction, so it gets a no-op UPDATE.
+    """
+    due = models.Due
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(update(due).where(*where).values(paid=due.paid).execution_options(synchronize_session=False))
+    else:
+        db.execute(select(due.id).where(*where).with_for_update()).all()
 
 @router.patch("/{did}", response_model=schemas.DueOut)
-def settle_due(did: int, db: Session = Depends(get_db)):
-    d = db.query(models.Due).get(did)
+def settle_due(did: int, amount: Optional[float] = Query(None, gt=0), db: Session = Depends(get_db)):
+    # without the lock two concurrent settles both see it open and both credit the ledger
+    _lock_dues(db, models.Due.id == did)
+    d = db.get(models.Due, did)
     if not d: raise HTTPException(404, "Due not found")
-    d.is_settled = True
+    if not d.is_settled:
+        remaining = d.amount - d.paid
+        pay = remaining if amount is None else min(amount, remaining)
+        closes = pay >= remaining - _EPS
+        ledger.apply_due(db, d.customer_name, -pay, -1 if closes else 0)
+        # increment in SQL, never past the amount, rather than writing back what was read
+        due = models.Due
+        new_paid = due.paid + pay
+        db.execute(
+            update(due)
+            .where(due.id == did)
+            .values(paid=case((new_paid > due.amount, due.amount), else_=new_paid), is_settled=closes)
+            .execution_options(synchronize_session=False)
+        )
     db.commit(); db.refresh(d)
     return d
+
+@router.post("/settle", response_model=schemas.BulkSettleOut)
+def bulk_settle(body: schemas.BulkSettleIn, db: Session = Depends(get_db)):
+    if not body.ids and not body.customer_name:
+        raise HTTPException(422, "Provide ids and/or customer_name")
+    due = models.Due
+    remaining = due.amount - due.paid
+
+    # allocate the payment oldest-first: each due gets what is left after the dues before it
+    if body.amount is None:
+        alloc = remaining
+    else:
+        paid_before = func.sum(remaining).over(order_by=(due.created_at, due.id), rows=(None, -1))
+        left = body.amount - func.coalesce(paid_before, 0.0)
+        alloc = case((left <= 0, 0.0), (left >= remaining, remaining), else_=left)
+    scope = [due.is_settled == False]  # noqa: E712
+    if body.ids:
+        scope.append(due.id.in_(body.ids))
+    if body.customer_name:
+        scope.append(due.customer_name == body.customer_name)
+    # the plan is read once, under lock, and both the dues and the ledger are written from it
+    _lock_dues(db, *scope)
+    plan = db.execute(
+        select(due.id, due.customer_name, remaining.label("remaining"), alloc.label("alloc")).where(*scope)
+    ).all()
+    plan = [r for r in plan if r.alloc > 0]
+
+    if plan:
+        t = due.__table__       # Core table: executemany, not the ORM's bulk-by-primary-key path
+        db.execute(
+            update(t)
+            .where(t.c.id == bindparam("b_id"))
+            .values(paid=t.c.paid + bindparam("b_alloc"), is_settled=bindparam("b_closes")),
+            [{"b_id": r.id, "b_alloc": r.alloc, "b_closes": r.alloc >= r.remaining - _EPS} for r in plan],
+        )
+    per_customer: dict = {}
+    for r in plan:
+        paid, n_closed = per_customer.get(r.customer_name, (0.0, 0))
+        per_customer[r.customer_name] = (paid + r.alloc, n_closed + (r.alloc >= r.remaining - _EPS))
+    for name, (paid, n_closed) in per_customer.items():
+        ledger.apply_due(db, name, -paid, -n_closed)
+    db.commit()
+
+    applied = sum(r.alloc for r in plan)
+    settled = sum(n for _, n in per_customer.values())
+    touched = len(plan)
+    balances = (
+        db.query(models.CustomerBalance)
+        .filter(models.CustomerBalance.customer_name.in_(list(per_customer)))
+        .all()
+    )
+    return schemas.BulkSettleOut(
+        settled=settled,
+        partially_paid=touched - settled,
+        applied=round(applied, 2),
+        unapplied=round(max(0.0, (body.amount or applied) - applied), 2),
+        balances=balances,
+    )
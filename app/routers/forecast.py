@@ -1,32 +1,72 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from datetime import date
+from datetime import date, timedelta
+from typing import List
 from app.db import get_db
 from app import models, schemas
+from app.utils import backtest, holt_state, seasonal
 from app.utils.forecasting import holt_additive, build_future_dates
 
 router = APIRouter(prefix="/api/v1/forecast", tags=["forecast"])
 
+def daily_series(db: Session, product_id: int, end: date) -> List[float]:
+    # units sold per day from the first sale through `end`, zero-filled
+    rows = (
+        db.query(func.date(models.Sale.created_at).label("d"), func.sum(models.Sale.qty).label("qty"))
+        .filter(models.Sale.product_id == product_id)
+        .group_by(func.date(models.Sale.created_at))
+        .all()
+    )
+    archived = (
+        db.query(models.SaleDaily.day, models.SaleDaily.qty)
+        .filter(models.SaleDaily.product_id == product_id)
+        .all()
+    )
+    by_day = {str(d): float(q) for d, q in archived}
+    for r in rows:
+        by_day[str(r.d)] = by_day.get(str(r.d), 0.0) + float(r.qty)
+    by_day = {d: q for d, q in by_day.items() if d <= end.isoformat()}
+    if not by_day:
+        return []
+    start = date.fromisoformat(min(by_day))
+    return [by_day.get((start + timedelta(days=i)).isoformat(), 0.0) for i in range((end - start).days + 1)]
+
 @router.post("/", response_model=schemas.ForecastOut)
 def forecast(body: schemas.ForecastIn, db: Session = Depends(get_db)):
     product = db.query(models.Product).get(body.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    q = (
-        db.query(models.Sale)
-        .filter(models.Sale.product_id == product.id)
-        .order_by(models.Sale.created_at.asc())
-        .all()
-    )
-    # convert DB values to floats to satisfy holt_additive(List[float]) typing
-    series = [float(s.qty or 0) for s in q]
-    if not series:
-        base = max(8, product.stock // 3)
-        series = [float(max(0, base + int(3 * (i % 5) - 2))) for i in range(60)]
-
     horizon = body.horizon_days
-    yhat = holt_additive(series, horizon)
     future_dates = build_future_dates(date.today(), horizon)
+    if body.model == "holt_winters":
+        # fit on complete days only (today's partial day would read as a slump) and forecast from today
+        yesterday = date.today() - timedelta(days=1)
+        series = daily_series(db, product.id, yesterday)
+        if len(series) >= 2 * seasonal.SEASON:
+            yhat, params = seasonal.holt_winters(series, horizon)
+            days = build_future_dates(yesterday, horizon)
+            points = [{"date": d, "forecast_qty": round(float(v), 2)} for d, v in zip(days, yhat)]
+            return {"points": points, "model": "holt_winters", "params": params}
+        # under two weeks of history there is no season to fit; fall through to Holt
+
+    st = db.get(models.ForecastState, product.id)
+    if st is None and db.query(models.Sale.id).filter(models.Sale.product_id == product.id).first():
+        # history recorded before incremental state existed: replay once, then O(1) from here on
+        holt_state.refit(db, product.id)
+        st = db.get(models.ForecastState, product.id)
+
+    if st is not None:
+        yhat = holt_state.project(st, horizon)
+    else:
+        base = max(8, product.stock // 3)
+        series = [float(max(0, base + int(3 * (i % 5) - 2))) for i in range(60)]
+        yhat = holt_additive(series, horizon)
     points = [{"date": d, "forecast_qty": round(float(v), 2)} for d, v in zip(future_dates, yhat)]
-    return {"points": points}
+    return {"points": points, "model": "holt"}
+
+@router.post("/backtest", response_model=schemas.BacktestOut)
+def run_backtest(body: schemas.BacktestIn, db: Session = Depends(get_db)):
+    series = backtest.load_series(db, body.model, body.product_ids)
+    return backtest.run(series, body.model, body.horizon_days, body.min_train)
@@ -0,0 +1,57 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app import models, schemas
+from app.utils import jobs
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+@router.get("/kinds")
+def list_kinds():
+    return {kind: params.model_json_schema() for kind, params in jobs.kinds().items()}
+
+@router.get("/", response_model=list[schemas.JobOut])
+def list_jobs(
+    status: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    q = db.query(models.Job)
+    if status:
+        q = q.filter(models.Job.status == status)
+    return q.order_by(models.Job.created_at.desc()).limit(limit).all()
+
+@router.post("/", response_model=schemas.JobOut, status_code=202)
+def submit_job(body: schemas.JobIn, db: Session = Depends(get_db)):
+    try:
+        params = jobs.validate(body.kind, body.params)
+    except KeyError:
+        raise HTTPException(404, f"Unknown job kind: {body.kind}")
+    except ValidationError as e:
+        raise HTTPException(422, e.errors(include_url=False))
+    try:
+        return jobs.submit(db, body.kind, params)
+    except jobs.QueueFull:
+        raise HTTPException(503, "Job queue is full, retry later")
+
+@router.get("/{job_id}", response_model=schemas.JobOut)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    j = db.get(models.Job, job_id)
+    if not j: raise HTTPException(404, "Job not found")
+    jobs.check_stale(db, j)
+    return j
+
+@router.get("/{job_id}/result")
+def get_result(job_id: str, db: Session = Depends(get_db)):
+    j = db.get(models.Job, job_id)
+    if not j: raise HTTPException(404, "Job not found")
+    jobs.check_stale(db, j)
+    if j.status == "failed":
+        raise HTTPException(409, f"Job failed: {j.error}")
+    if j.status != "succeeded":
+        raise HTTPException(409, f"Job is {j.status}")
+    return json.loads(j.result)
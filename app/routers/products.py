@@ -1,32 +1,142 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.db import get_db
 from app import models, schemas
+from app.utils import category_totals, search, sparse, stock
 
 router = APIRouter(prefix="/api/v1/products", tags=["products"])
 
+_FIELDS = ("sku", "name", "category", "stock", "price", "reorder_point")
+_COLUMNS = {c: getattr(models.Product, c) for c in ("id",) + _FIELDS}
+
 @router.get("/", response_model=list[schemas.ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).order_by(models.Product.id.desc()).all()
+def list_products(
+    fields: Optional[str] = Query(None, description="comma-separated subset of columns"),
+    shape: Literal["objects", "compact"] = Query("objects", alias="format"),
+    db: Session = Depends(get_db),
+):
+    if fields is None and shape == "objects":
+        return db.query(models.Product).order_by(models.Product.id.desc()).all()
+    cols = sparse.columns(fields, _COLUMNS)
+    rows = db.execute(select(*cols.values()).order_by(models.Product.id.desc()))
+    return sparse.respond(list(cols), rows, shape)
+
+@router.get("/search", response_model=list[schemas.ProductOut])
+def search_products(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    return search.search(db, q, limit, offset)
 
 @router.post("/", response_model=schemas.ProductOut)
 def create_product(body: schemas.ProductCreate, db: Session = Depends(get_db)):
     p = models.Product(**body.model_dump())
-    db.add(p); db.commit(); db.refresh(p)
+    db.add(p); db.flush()
+    stock.record(db, p.id, p.stock, "initial")
+    db.commit(); db.refresh(p)
     return p
 
+_CHUNK = 500    # keeps IN lists under SQLite's bound-parameter limit
+
+def _ids_by_key(db: Session, items: list[schemas.ProductBatchItem]) -> dict:
+    p = models.Product
+    ids = sorted({i.id for i in items if i.id is not None})
+    skus = sorted({i.sku for i in items if i.id is None})
+    found = {}
+    for n in range(0, len(ids), _CHUNK):
+        found.update((("id", r), r) for (r,) in db.query(p.id).filter(p.id.in_(ids[n:n + _CHUNK])))
+    for n in range(0, len(skus), _CHUNK):
+        found.update((("sku", s), r) for r, s in db.query(p.id, p.sku).filter(p.sku.in_(skus[n:n + _CHUNK])))
+    return found
+
+def _tracked_changes(db: Session, groups: dict) -> dict:
+    """{product id: {"stock"/"category": (before, after)}} for the columns other tables follow.
+
+    The previous values are read under a row lock (Postgres) so the stock movements and
+    category totals match the update; with repeated ids the last assignment wins, as in the UPDATEs.
+    """
+    after: dict[int, dict] = {}
+    for cols, rows in groups.items():
+        for c in ("stock", "category"):
+            if c in cols:
+                for r in rows:
+                    after.setdefault(r["b_id"], {})[c] = r[f"b_{c}"]
+    ids = sorted(after)
+    p = models.Product
+    out = {}
+    for n in range(0, len(ids), _CHUNK):
+        q = db.query(p.id, p.stock, p.category).filter(p.id.in_(ids[n:n + _CHUNK])).with_for_update()
+        for pid, old_stock, old_category in q:
+            before = {"stock": old_stock, "category": old_category}
+            out[pid] = {c: (before[c], v) for c, v in after[pid].items() if before[c] != v}
+    return out
+
+@router.patch("/batch", response_model=schemas.ProductBatchOut)
+def batch_update_products(body: schemas.ProductBatchIn, db: Session = Depends(get_db)):
+    if any(i.id is None and i.sku is None for i in body.items):
+        raise HTTPException(422, "Each item needs an id or a sku")
+    found = _ids_by_key(db, body.items)
+
+    # one executemany per distinct set of patched columns
+    groups: dict[tuple, list[dict]] = {}
+    not_found = []
+    for item in body.items:
+        key = ("id", item.id) if item.id is not None else ("sku", item.sku)
+        pid = found.get(key)
+        if pid is None:
+            not_found.append(str(key[1]))
+            continue
+        values = item.model_dump(exclude_none=True, include=set(_FIELDS))
+        if item.id is None:
+            values.pop("sku")
+        if values:
+            groups.setdefault(tuple(sorted(values)), []).append({"b_id": pid, **{f"b_{k}": v for k, v in values.items()}})
+
+    t = models.Product.__table__
+    updated = 0
+    try:
+        changes = _tracked_changes(db, groups)
+        stock.record_many(db, (
+            {"product_id": pid, "delta": c["stock"][1] - c["stock"][0], "kind": "adjustment"}
+            for pid, c in changes.items() if "stock" in c
+        ))
+        for pid, c in changes.items():
+            if "category" in c:
+                category_totals.move_product(db, pid, *c["category"])
+        for cols, rows in groups.items():
+            stmt = update(t).where(t.c.id == bindparam("b_id")).values({c: bindparam(f"b_{c}") for c in cols})
+            db.execute(stmt, rows)
+            updated += len(rows)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(409, "Batch would create a duplicate sku; nothing was applied")
+    return {"requested": len(body.items), "updated": updated, "not_found": not_found}
+
 @router.patch("/{pid}", response_model=schemas.ProductOut)
 def update_product(pid: int, body: schemas.ProductUpdate, db: Session = Depends(get_db)):
-    p = db.query(models.Product).get(pid)
+    # row lock (Postgres), as in the batch path: a concurrent sale then records under the category it ends up in
+    p = db.query(models.Product).filter(models.Product.id == pid).with_for_update().first()
     if not p: raise HTTPException(404, "Product not found")
-    for k, v in body.model_dump(exclude_none=True).items():
+    changes = body.model_dump(exclude_none=True)
+    if "stock" in changes:
+        stock.record(db, p.id, changes["stock"] - p.stock, "adjustment")
+    if "category" in changes:
+        category_totals.move_product(db, p.id, p.category, changes["category"])
+    for k, v in changes.items():
         setattr(p, k, v)
     db.commit(); db.refresh(p)
     return p
 
 @router.delete("/{pid}")
 def delete_product(pid: int, db: Session = Depends(get_db)):
-    p = db.query(models.Product).get(pid)
+    p = db.query(models.Product).filter(models.Product.id == pid).with_for_update().first()
     if not p: raise HTTPException(404, "Product not found")
+    category_totals.move_product(db, p.id, p.category, None)
     db.delete(p); db.commit()
     return {"ok": True}
@@ -1,13 +1,15 @@
 # app/routers/reports.py
 from datetime import datetime, timedelta, date
-from typing import List
+from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func
+from sqlalchemy import func, select, union_all
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app import models, schemas
+from app.utils import analytics, rolling, sketches
+from app.utils.singleflight import coalesced, group
 
 router = APIRouter(prefix="/api/v1/reports", tags=["reports"])
 
@@ -18,6 +20,31 @@ def _sum_sales_total(q):
     return func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0)
 
 
+def _product_revenue():
+    # revenue per product from live sales plus the rollup of archived months
+    live = select(
+        models.Sale.product_id.label("product_id"),
+        func.sum(models.Sale.qty * models.Sale.unit_price).label("revenue"),
+    ).group_by(models.Sale.product_id)
+    archived = select(
+        models.SaleDaily.product_id.label("product_id"),
+        func.sum(models.SaleDaily.revenue).label("revenue"),
+    ).group_by(models.SaleDaily.product_id)
+    return union_all(live, archived).subquery()
+
+
+def _product_names(db: Session, ids) -> dict:
+    rows = db.query(models.Product.id, models.Product.name).filter(models.Product.id.in_(list(ids))).all()
+    return {pid: name for pid, name in rows}
+
+
+def _approx_top(db: Session, limit: int, days=None) -> List[schemas.TopProduct]:
+    # heavy-hitter sketch: estimates are within `error` above the true revenue
+    top = sketches.current().top(limit, days)
+    names = _product_names(db, [pid for pid, _, _ in top])
+    return [schemas.TopProduct(name=names.get(pid, f"#{pid}"), revenue=float(c)) for pid, c, _ in top]
+
+
 def _today_bounds() -> tuple[datetime, datetime]:
     today = date.today()
     start = datetime.combine(today, datetime.min.time())
@@ -43,18 +70,22 @@ def _month_bounds() -> tuple[datetime, datetime]:
 # Summary KPIs for dashboard
 # =========================
 @router.get("/summary", response_model=schemas.ReportSummary)
-def summary(db: Session = Depends(get_db)):
-    # Today sales total
+@coalesced
+def summary(exact: bool = Query(False), db: Session = Depends(get_db)):
+    # Today / this week: from the in-memory window when it is running
     t0, t1 = _today_bounds()
-    today_total = db.query(_sum_sales_total(models.Sale)).filter(
-        models.Sale.created_at >= t0, models.Sale.created_at <= t1
-    ).scalar() or 0.0
-
-    # This week total
     w0, w1 = _week_bounds()
-    week_total = db.query(_sum_sales_total(models.Sale)).filter(
-        models.Sale.created_at >= w0, models.Sale.created_at <= w1
-    ).scalar() or 0.0
+    window = rolling.current()
+    if window is not None and window.covers(w0):
+        today_total = window.total(t0, t1)
+        week_total = window.total(w0, w1)
+    else:
+        today_total = db.query(_sum_sales_total(models.Sale)).filter(
+            models.Sale.created_at >= t0, models.Sale.created_at <= t1
+        ).scalar() or 0.0
+        week_total = db.query(_sum_sales_total(models.Sale)).filter(
+            models.Sale.created_at >= w0, models.Sale.created_at <= w1
+        ).scalar() or 0.0
 
     # This month total
     m0, m1 = _month_bounds()
@@ -62,10 +93,8 @@ def summary(db: Session = Depends(get_db)):
         models.Sale.created_at >= m0, models.Sale.created_at <= m1
     ).scalar() or 0.0
 
-    # Pending dues
-    total_dues = db.query(func.coalesce(func.sum(models.Due.amount), 0.0)).filter(
-        models.Due.is_settled == False  # noqa: E712
-    ).scalar() or 0.0
+    # Pending dues (one row per customer instead of every due)
+    total_dues = db.query(func.coalesce(func.sum(models.CustomerBalance.balance), 0.0)).scalar() or 0.0
 
     # Low stock
     low_stock = db.query(models.Product).filter(
@@ -73,18 +102,22 @@ def summary(db: Session = Depends(get_db)):
     ).count()
 
     # Top product (by revenue) last 30d
-    d0 = datetime.now() - timedelta(days=30)
-    top_row = (
-        db.query(
-            models.Product.name.label("name"),
-            func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("revenue"),
+    if sketches.current() is not None and not exact:
+        approx = _approx_top(db, 1, days=30)
+        top_row = approx[0] if approx else None
+    else:
+        d0 = datetime.now() - timedelta(days=30)
+        top_row = (
+            db.query(
+                models.Product.name.label("name"),
+                func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("revenue"),
+            )
+            .join(models.Product, models.Product.id == models.Sale.product_id)
+            .filter(models.Sale.created_at >= d0)
+            .group_by(models.Product.id)
+            .order_by(func.sum(models.Sale.qty * models.Sale.unit_price).desc())
+            .first()
         )
-        .join(models.Product, models.Product.id == models.Sale.product_id)
-        .filter(models.Sale.created_at >= d0)
-        .group_by(models.Product.id)
-        .order_by(func.sum(models.Sale.qty * models.Sale.unit_price).desc())
-        .first()
-    )
     top_product = schemas.TopProduct(name=top_row.name, revenue=float(top_row.revenue)) if top_row else None
 
     return schemas.ReportSummary(
@@ -97,24 +130,61 @@ def summary(db: Session = Depends(get_db)):
     )
 
 
+# =========================
+# Today: total, top product, hourly series
+# =========================
+@router.get("/today", response_model=schemas.TodaySummary)
+@coalesced
+def today(db: Session = Depends(get_db)):
+    t0, t1 = _today_bounds()
+    window = rolling.current()
+    if window is None:
+        # no live window: aggregate today's rows the same way
+        window = rolling.RollingSales(hours=24)
+        window.load(db, t0)
+    top = window.top_product(t0, t1)
+    top_product = None
+    if top:
+        pid, revenue = top
+        name = window.names.get(pid) or db.query(models.Product.name).filter(models.Product.id == pid).scalar()
+        top_product = schemas.TopProduct(name=name or f"#{pid}", revenue=revenue)
+    return schemas.TodaySummary(
+        total=window.total(t0, t1),
+        top_product=top_product,
+        hourly=[schemas.SeriesPoint(date=ts.isoformat(timespec="minutes"), value=v) for ts, v in window.hourly(t0, 24)],
+    )
+
+
 # =========================
 # Sales series for charts
 # =========================
 @router.get("/sales-series", response_model=List[schemas.SeriesPoint])
+@coalesced
 def sales_series(days: int = Query(30, ge=1, le=120), db: Session = Depends(get_db)):
     start = date.today() - timedelta(days=days - 1)
-    rows = (
-        db.query(
-            func.date(models.Sale.created_at).label("d"),
-            func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("total"),
+    if analytics.enabled():
+        rows = analytics.backend().sales_series(start)
+    else:
+        rows = (
+            db.query(
+                func.date(models.Sale.created_at).label("d"),
+                func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("total"),
+            )
+            .filter(models.Sale.created_at >= start)
+            .group_by(func.date(models.Sale.created_at))
+            .order_by(func.date(models.Sale.created_at))
+            .all()
+        )
+        rows += (
+            db.query(models.SaleDaily.day, func.sum(models.SaleDaily.revenue))
+            .filter(models.SaleDaily.day >= start)
+            .group_by(models.SaleDaily.day)
+            .all()
         )
-        .filter(models.Sale.created_at >= start)
-        .group_by(func.date(models.Sale.created_at))
-        .order_by(func.date(models.Sale.created_at))
-        .all()
-    )
     # Fill missing dates with 0
-    by_day = {str(r.d): float(r.total) for r in rows}
+    by_day = {}
+    for d, total in rows:
+        by_day[str(d)] = by_day.get(str(d), 0.0) + float(total)
     out: List[schemas.SeriesPoint] = []
     for i in range(days):
         d = (start + timedelta(days=i)).isoformat()
@@ -126,40 +196,45 @@ def sales_series(days: int = Query(30, ge=1, le=120), db: Session = Depends(get_
 # Top N products (revenue)
 # =========================
 @router.get("/top-products", response_model=List[schemas.TopProduct])
-def top_products(limit: int = Query(5, ge=1, le=20), db: Session = Depends(get_db)):
-    rows = (
-        db.query(
-            models.Product.name.label("name"),
-            func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("revenue"),
+@coalesced
+def top_products(limit: int = Query(5, ge=1, le=20), exact: bool = Query(False), db: Session = Depends(get_db)):
+    if sketches.current() is not None and not exact:
+        return _approx_top(db, limit)
+    if analytics.enabled():
+        rows = analytics.backend().top_products(limit)
+    else:
+        rev = _product_revenue()
+        rows = (
+            db.query(models.Product.name.label("name"), func.sum(rev.c.revenue).label("revenue"))
+            .join(models.Product, models.Product.id == rev.c.product_id)
+            .group_by(models.Product.id)
+            .order_by(func.sum(rev.c.revenue).desc())
+            .limit(limit)
+            .all()
         )
-        .join(models.Product, models.Product.id == models.Sale.product_id)
-        .group_by(models.Product.id)
-        .order_by(func.sum(models.Sale.qty * models.Sale.unit_price).desc())
-        .limit(limit)
-        .all()
-    )
-    return [schemas.TopProduct(name=r.name, revenue=float(r.revenue)) for r in rows]
+    return [schemas.TopProduct(name=name, revenue=float(revenue)) for name, revenue in rows]
 
 
 # =========================
 # Category revenue share
 # =========================
 @router.get("/category-share", response_model=List[schemas.CategoryShare])
-def category_share(db: Session = Depends(get_db)):
-    rows = (
-        db.query(
-            models.Product.category.label("category"),
-            func.coalesce(func.sum(models.Sale.qty * models.Sale.unit_price), 0.0).label("revenue"),
-        )
-        .join(models.Product, models.Product.id == models.Sale.product_id)
-        .group_by(models.Product.category)
-        .order_by(func.sum(models.Sale.qty * models.Sale.unit_price).desc())
-        .all()
-    )
-    total = sum(float(r.revenue) for r in rows) or 1.0
+@coalesced
+def category_share(days: Optional[int] = Query(None, ge=1, le=366), db: Session = Depends(get_db)):
+    # precomputed per day and category (utils/category_totals.py); `days` limits it to the last N days
+    cd = models.CategoryDaily
+    q = db.query(cd.category, func.sum(cd.revenue).label("revenue"))
+    if days is not None:
+        q = q.filter(cd.day >= date.today() - timedelta(days=days - 1))
+    rows = [
+        (category, revenue)
+        for category, revenue in q.group_by(cd.category).order_by(func.sum(cd.revenue).desc())
+        if revenue > 1e-9    # categories emptied by moving products out
+    ]
+    total = sum(float(revenue) for _, revenue in rows) or 1.0
     return [
-        schemas.CategoryShare(category=r.category, revenue=float(r.revenue), pct=round(float(r.revenue) * 100.0 / total, 2))
-        for r in rows
+        schemas.CategoryShare(category=category, revenue=float(revenue), pct=round(float(revenue) * 100.0 / total, 2))
+        for category, revenue in rows
     ]
 
 
@@ -167,6 +242,7 @@ def category_share(db: Session = Depends(get_db)):
 # Recent activity feed
 # =========================
 @router.get("/recent", response_model=List[schemas.ActivityItem])
+@coalesced
 def recent(limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
     # latest sales
     sales = (
@@ -222,3 +298,12 @@ def recent(limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
         )
     items.sort(key=lambda x: x.ts, reverse=True)
     return items[:limit]
+
+
+# =========================
+# Coalescing metrics
+# =========================
+@router.get("/metrics")
+def metrics():
+    # per report: calls received, executions, calls served by another in-flight execution
+    return {"singleflight": group.stats()}
@@ -1,27 +1,48 @@
 # app/routers/sales.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from ..db import SessionLocal
+from ..db import get_db
 from .. import models, schemas
-from typing import Any, cast
+from ..utils import category_totals, group_commit, holt_state, idempotency, ledger, sale_events, sparse, stock
+from datetime import datetime
+from typing import Any, Literal, Optional, cast
 
 router = APIRouter(prefix="/api/v1/sales", tags=["sales"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_COLUMNS = {
+    **{c: getattr(models.Sale, c) for c in
+       ("id", "product_id", "qty", "unit_price", "is_credit", "customer_name", "created_at")},
+    "product_name": models.Product.name,
+}
 
 @router.get("/", response_model=list[schemas.SaleOut])
-def list_sales(db: Session = Depends(get_db)):
-    rows = (
+def list_sales(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="comma-separated subset of columns"),
+    shape: Literal["objects", "compact"] = Query("objects", alias="format"),
+    db: Session = Depends(get_db),
+):
+    # date bounds use the created_at index; archived months are no longer in `sales`
+    bounds = []
+    if start is not None:
+        bounds.append(models.Sale.created_at >= start)
+    if end is not None:
+        bounds.append(models.Sale.created_at < end)
+    if fields is not None or shape != "objects":
+        cols = sparse.columns(fields, _COLUMNS)
+        q = select(*cols.values()).select_from(models.Sale).where(*bounds)
+        if "product_name" in cols:
+            q = q.join(models.Product, models.Product.id == models.Sale.product_id)
+        rows = db.execute(q.order_by(models.Sale.created_at.desc()))
+        return sparse.respond(list(cols), rows, shape)
+
+    q = (
         db.query(models.Sale, models.Product.name.label("product_name"))
         .join(models.Product, models.Product.id == models.Sale.product_id)
-        .order_by(models.Sale.created_at.desc())
-        .all()
     )
+    rows = q.filter(*bounds).order_by(models.Sale.created_at.desc()).all()
     out = []
     for sale, product_name in rows:
         out.append(
@@ -39,7 +60,42 @@ def list_sales(db: Session = Depends(get_db)):
     return out
 
 @router.post("/", response_model=schemas.SaleOut)
-def create_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
+def create_sale(
+    payload: schemas.SaleCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+):
+    # retries with the same Idempotency-Key get the first response back
+    return idempotency.run("sales", idempotency_key, payload, lambda: _create_sale(payload, db))
+
+def _create_sale(payload: schemas.SaleCreate, db: Session) -> schemas.SaleOut:
+    if group_commit.GROUP_COMMIT:
+        # committed together with concurrent sales; returns once that commit is durable
+        sale, product_name = group_commit.current().submit(lambda gdb: _add_sale(payload, gdb, refresh=True))
+    else:
+        sale, product_name = _add_sale(payload, db)
+        # 🔴 THIS WAS LIKELY MISSING
+        db.commit()
+        db.refresh(sale)
+    sale_events.publish(sale, product_name)
+
+    return schemas.SaleOut(
+        id=int(cast(Any, sale.id)),
+        product_id=int(cast(Any, sale.product_id)),
+        qty=int(cast(Any, sale.qty)),
+        unit_price=float(cast(Any, sale.unit_price)),
+        is_credit=bool(cast(Any, sale.is_credit)),
+        customer_name=cast(Any, sale.customer_name),
+        created_at=cast(Any, sale.created_at),
+        product_name=product_name,
+    )
+
+def _add_sale(payload: schemas.SaleCreate, db: Session, refresh: bool = False):
+    """Write one sale and everything derived from it; the caller commits.
+
+    Rejections (404/400) are raised before anything is written, which group
+    commit relies on to fail one sale without rolling back its batch.
+    """
     product = db.query(models.Product).get(payload.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -57,6 +113,10 @@ def create_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
         customer_name=(payload.customer_name or None),
     )
     db.add(sale)
+    db.flush()
+    stock.record(db, payload.product_id, -payload.qty, "sale", ref_id=sale.id)
+    category_totals.record_sale(db, sale.id)
+    holt_state.observe(db, payload.product_id, payload.qty)
 
     if payload.is_credit:
         due = models.Due(
@@ -66,18 +126,8 @@ def create_sale(payload: schemas.SaleCreate, db: Session = Depends(get_db)):
             is_settled=False,
         )
         db.add(due)
+        ledger.apply_due(db, due.customer_name, due.amount, 1)
 
-    # 🔴 THIS WAS LIKELY MISSING
-    db.commit()
-    db.refresh(sale)
-
-    return schemas.SaleOut(
-        id=int(cast(Any, sale.id)),
-        product_id=int(cast(Any, sale.product_id)),
-        qty=int(cast(Any, sale.qty)),
-        unit_price=float(cast(Any, sale.unit_price)),
-        is_credit=bool(cast(Any, sale.is_credit)),
-        customer_name=cast(Any, sale.customer_name),
-        created_at=cast(Any, sale.created_at),
-        product_name=str(product.name),
-    )
+    if refresh:
+        db.refresh(sale, ["created_at"])    # server default, read before the batch's session closes
+    return sale, str(product.name)
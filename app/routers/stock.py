@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.db import get_db
+from app import models, schemas
+from app.utils import demand, stock
+
+router = APIRouter(prefix="/api/v1/stock", tags=["stock"])
+
+@router.get("/at", response_model=schemas.StockAtOut)
+def stock_at(at: datetime, db: Session = Depends(get_db)):
+    levels, snap, applied = stock.stock_at(db, at)
+    return {
+        "at": at,
+        "snapshot_at": snap.taken_at if snap else None,
+        "movements_applied": applied,
+        "stock": levels,
+    }
+
+def _demand(db: Session) -> demand.DemandStats:
+    stats = demand.current()
+    if stats is None:
+        # no live store: build the same window from the last DEMAND_DAYS of sales
+        stats = demand.DemandStats()
+        stats.seed(db)
+    return stats
+
+@router.get("/replenishment", response_model=schemas.ReplenishmentOut)
+def replenishment(
+    lead_time_days: int = Query(demand.LEAD_TIME_DAYS, ge=0, le=365),
+    cover_days: int = Query(14, ge=1, le=365),
+    service_level: float = Query(0.95, ge=0.5, lt=1.0),
+    db: Session = Depends(get_db),
+):
+    stats = _demand(db)
+    return {
+        "window_days": stats.days,
+        "lead_time_days": lead_time_days,
+        "cover_days": cover_days,
+        "service_level": service_level,
+        "items": demand.replenishment(db, stats, lead_time_days, cover_days, service_level),
+    }
+
+@router.get("/demand/{product_id}", response_model=schemas.DemandProfileOut)
+def demand_profile(product_id: int, db: Session = Depends(get_db)):
+    if db.get(models.Product, product_id) is None:
+        raise HTTPException(404, "Product not found")
+    stats = demand.current()
+    if stats is None:
+        stats = demand.DemandStats()
+        stats.load(db, product_id)
+    mean, std, days, today_qty = stats.profile(product_id)
+    return {
+        "product_id": product_id,
+        "window_days": stats.days,
+        "avg_daily": mean,
+        "std_daily": std,
+        "today_qty": today_qty,
+        "days": [{"day": d, "qty": q} for d, q in days],
+    }
+
+@router.get("/movements", response_model=list[schemas.StockMovementOut])
+def list_movements(
+    product_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+):
+    m = models.StockMovement
+    q = db.query(m)
+    if product_id is not None:
+        q = q.filter(m.product_id == product_id)
+    return q.order_by(m.id.desc()).offset(offset).limit(limit).all()
+
+@router.post("/restock", response_model=schemas.StockMovementOut)
+def restock(body: schemas.RestockIn, db: Session = Depends(get_db)):
+    p = models.Product
+    res = db.execute(update(p).where(p.id == body.product_id).values(stock=p.stock + body.qty))
+    if res.rowcount == 0:
+        raise HTTPException(404, "Product not found")
+    mv = models.StockMovement(product_id=body.product_id, delta=body.qty, kind="restock", note=body.note)
+    db.add(mv)
+    db.commit(); db.refresh(mv)
+    return mv
+
+@router.post("/snapshots", response_model=schemas.StockSnapshotOut)
+def create_snapshot(db: Session = Depends(get_db)):
+    return stock.take_snapshot(db)
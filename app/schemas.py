@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime
+from typing import Any, Optional, List, Literal, Dict
 
 # Products
 class ProductBase(BaseModel):
@@ -24,6 +24,77 @@ class ProductOut(ProductBase):
     id: int
     class Config: from_attributes = True
 
+class ProductBatchItem(ProductUpdate):
+    # matched by `id` when given (then `sku` is a new value), otherwise by `sku`
+    id: Optional[int] = None
+
+class ProductBatchIn(BaseModel):
+    items: List[ProductBatchItem] = Field(min_length=1, max_length=50_000)
+
+class ProductBatchOut(BaseModel):
+    requested: int
+    updated: int
+    not_found: List[str]
+
+# Stock
+class StockMovementOut(BaseModel):
+    id: int
+    product_id: int
+    delta: int
+    kind: str
+    ref_id: Optional[int] = None
+    note: Optional[str] = None
+    created_at: datetime
+    class Config: from_attributes = True
+
+class RestockIn(BaseModel):
+    product_id: int
+    qty: int = Field(gt=0)
+    note: Optional[str] = None
+
+class StockAtOut(BaseModel):
+    at: datetime
+    snapshot_at: Optional[datetime] = None
+    movements_applied: int
+    stock: Dict[int, int]
+
+class StockSnapshotOut(BaseModel):
+    id: int
+    taken_at: datetime
+    last_movement_id: int
+    products: int
+    class Config: from_attributes = True
+
+class ReplenishmentItem(BaseModel):
+    product_id: int
+    name: str
+    stock: int
+    reorder_point: int
+    avg_daily: float
+    std_daily: float
+    days_of_cover: Optional[float] = None   # None: no demand in the window
+    reorder_at: int                         # max(reorder_point, lead-time demand + safety stock)
+    suggested_qty: int
+
+class ReplenishmentOut(BaseModel):
+    window_days: int
+    lead_time_days: int
+    cover_days: int
+    service_level: float
+    items: List[ReplenishmentItem]
+
+class DemandDay(BaseModel):
+    day: date
+    qty: float
+
+class DemandProfileOut(BaseModel):
+    product_id: int
+    window_days: int
+    avg_daily: float
+    std_daily: float
+    today_qty: float
+    days: List[DemandDay]
+
 # Sales
 class SaleCreate(BaseModel):
     product_id: int
@@ -52,15 +123,57 @@ class DueOut(BaseModel):
     id: int
     customer_name: str
     amount: float
+    paid: float = 0.0
     note: Optional[str] = None
     is_settled: bool
     created_at: datetime
     class Config: from_attributes = True
 
+class CustomerBalanceOut(BaseModel):
+    customer_name: str
+    balance: float
+    open_dues: int
+    updated_at: datetime
+    class Config: from_attributes = True
+
+class BulkSettleIn(BaseModel):
+    # select dues by id and/or customer; without `amount` they are settled in full,
+    # otherwise the payment is applied oldest-first
+    ids: Optional[List[int]] = None
+    customer_name: Optional[str] = None
+    amount: Optional[float] = Field(default=None, gt=0)
+
+class BulkSettleOut(BaseModel):
+    settled: int
+    partially_paid: int
+    applied: float
+    unapplied: float
+    balances: List[CustomerBalanceOut]
+
+class AgingBuckets(BaseModel):
+    # outstanding (amount - paid) of unsettled dues by age in days
+    days_0_30: float
+    days_31_60: float
+    days_61_90: float
+    days_90_plus: float
+    total: float
+    open_dues: int
+
+class CustomerAging(AgingBuckets):
+    customer_name: str
+
+class DuesAgingOut(BaseModel):
+    as_of: datetime
+    totals: AgingBuckets
+    customers_total: int
+    customers: List[CustomerAging]
+
 # Forecast
 class ForecastIn(BaseModel):
     product_id: int
     horizon_days: int = Field(ge=1, le=60)
+    # "holt": per-sale Holt trend; "holt_winters": daily demand with weekly season, fitted parameters
+    model: Literal["holt", "holt_winters"] = "holt"
 
 class ForecastPoint(BaseModel):
     date: str
@@ -68,6 +181,57 @@ class ForecastPoint(BaseModel):
 
 class ForecastOut(BaseModel):
     points: List[ForecastPoint]
+    model: str = "holt"
+    params: Optional[Dict[str, float]] = None
+
+class BacktestIn(BaseModel):
+    model: Literal["holt", "holt_winters"] = "holt"
+    horizon_days: int = Field(7, ge=1, le=60)
+    min_train: int = Field(28, ge=2)      # observations before the first forecast origin
+    product_ids: Optional[List[int]] = None
+
+class BacktestMetrics(BaseModel):
+    n: int                                # forecast/actual pairs scored
+    mae: float
+    mape: Optional[float] = None          # percent, over non-zero actuals
+    bias: float                           # mean(forecast - actual)
+
+class ProductBacktest(BacktestMetrics):
+    product_id: int
+
+class BacktestOut(BaseModel):
+    model: str
+    horizon_days: int
+    products: List[ProductBacktest]
+    aggregate: BacktestMetrics
+
+# Jobs
+class NoParams(BaseModel):
+    pass
+
+class ForecastBatchIn(BaseModel):
+    product_ids: Optional[List[int]] = None        # default: every product
+    horizon_days: int = Field(ge=1, le=60)
+    model: Literal["holt", "holt_winters"] = "holt"
+
+class ArchiveIn(BaseModel):
+    keep_months: Optional[int] = Field(default=None, ge=1)
+
+class JobIn(BaseModel):
+    kind: str
+    params: Dict[str, Any] = {}
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: str
+    progress: float
+    message: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    class Config: from_attributes = True
 # ---------- Reports DTOs ----------
 from datetime import datetime
 from typing import Optional, List
@@ -89,6 +253,11 @@ class SeriesPoint(BaseModel):
   date: str
   value: float
 
+class TodaySummary(BaseModel):
+  total: float
+  top_product: Optional[TopProduct] = None
+  hourly: List[SeriesPoint]
+
 class CategoryShare(BaseModel):
   category: str
   revenue: float
@@ -0,0 +1,32 @@
+# app/serve.py
+"""Production entry point: ``python -m app.serve --workers 4``.
+
+Prepares the schema once in the master process, then starts the uvicorn
+workers with schema setup disabled so they don't race on CREATE/ALTER.
+Point DATABASE_URL at Postgres for more than one worker; SQLite serializes
+writers and will mostly just queue them.
+"""
+import argparse
+import os
+
+import uvicorn
+
+from app.bootstrap import SKIP_ENV, init_db
+from app.db import engine
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.serve")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    args = parser.parse_args(argv)
+
+    init_db()
+    engine.dispose()  # don't hand pooled connections to the workers
+    os.environ[SKIP_ENV] = "1"  # inherited by the worker processes
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers, proxy_headers=True)
+
+
+if __name__ == "__main__":
+    main()
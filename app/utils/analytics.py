@@ -0,0 +1,220 @@
+# app/utils/analytics.py
+"""Optional DuckDB backend for the heavy aggregate reports.
+
+The OLTP database stays the source of truth; DuckDB keeps a columnar copy of
+``sales`` (append-only, synced incrementally by id) and ``products`` (small,
+refreshed on every sync) and answers the group-by queries from it. When
+months are archived (utils/archive.py) their rows are dropped from the copy
+and the ``sales_daily`` rollup is reloaded, so totals match the SQL path.
+
+On SQLite writers are serialized, so ids commit in order and the id
+watermark is exact. Postgres assigns ids at insert time, so a transaction
+that commits late leaves a lower id behind the watermark. For server
+databases each sync therefore also re-reads the sales created in the last
+``ANALYTICS_SYNC_LAG_SECONDS`` (measured back from the newest row already
+copied) and skips the ids it already has. Set the lag above the longest
+transaction that records a sale.
+
+Enable with ``ANALYTICS_BACKEND=duckdb`` (requires ``pip install duckdb``).
+"""
+import csv
+import os
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.db import current_tenant, engine
+from app import models
+from app.utils import archive
+
+ANALYTICS_BACKEND = os.getenv("ANALYTICS_BACKEND", "sql").lower()
+ANALYTICS_DUCKDB_PATH = os.getenv("ANALYTICS_DUCKDB_PATH", ":memory:")
+ANALYTICS_SYNC_SECONDS = float(os.getenv("ANALYTICS_SYNC_SECONDS", "60"))
+ANALYTICS_SYNC_LAG_SECONDS = float(os.getenv("ANALYTICS_SYNC_LAG_SECONDS", "300"))
+SYNC_CHUNK = 50_000
+
+_REVENUE = "SUM(s.qty * s.unit_price)"
+
+
+def enabled() -> bool:
+    return ANALYTICS_BACKEND == "duckdb"
+
+
+class DuckAnalytics:
+    def __init__(self, path: str = ANALYTICS_DUCKDB_PATH, sync_seconds: float = ANALYTICS_SYNC_SECONDS, bind=engine,
+                 sync_lag_seconds: float = ANALYTICS_SYNC_LAG_SECONDS):
+        import duckdb  # optional dependency, only needed when the backend is enabled
+
+        self.con = duckdb.connect(path)
+        self.bind = bind
+        self.sync_seconds = sync_seconds
+        self.sync_lag = timedelta(seconds=sync_lag_seconds) if bind.dialect.name != "sqlite" else None
+        self._lock = threading.Lock()
+        self._synced_at = 0.0
+        self._archived = None       # archived_months as of the last rollup reload
+        self._attached = self._try_attach()
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS sales ("
+            " id BIGINT PRIMARY KEY, product_id BIGINT, qty BIGINT, unit_price DOUBLE, created_at TIMESTAMP)"
+        )
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS products (id BIGINT PRIMARY KEY, name VARCHAR, category VARCHAR)"
+        )
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS sales_daily ("
+            " day DATE, product_id BIGINT, qty BIGINT, revenue DOUBLE, PRIMARY KEY (day, product_id))"
+        )
+
+    def close(self) -> None:
+        self.con.close()
+
+    def _try_attach(self) -> bool:
+        # Reading the SQLite file directly is much faster than paging rows through
+        # Python, but the scanner extension may not be installed (offline hosts).
+        url = self.bind.url
+        if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+            return False
+        try:
+            self.con.execute("LOAD sqlite")
+            self.con.execute(f"ATTACH '{url.database}' AS src (TYPE SQLITE, READ_ONLY)")
+            return True
+        except Exception:
+            return False
+
+    # ----- sync
+    def sync(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and time.monotonic() - self._synced_at < self.sync_seconds:
+                return
+            last_id = self.con.execute("SELECT COALESCE(MAX(id), 0) FROM sales").fetchone()[0]
+            if self._attached:
+                self.con.execute(
+                    "INSERT INTO sales SELECT id, product_id, qty, unit_price, created_at"
+                    " FROM src.sales WHERE id > ?",
+                    [last_id],
+                )
+                self.con.execute("DELETE FROM products")
+                self.con.execute("INSERT INTO products SELECT id, name, category FROM src.products")
+            else:
+                self._sync_via_sqlalchemy(last_id)
+            self._sync_archive()
+            self._synced_at = time.monotonic()
+
+    def _sync_via_sqlalchemy(self, last_id: int) -> None:
+        s = models.Sale
+        new = s.id > last_id
+        newest = self.con.execute("SELECT MAX(created_at) FROM sales").fetchone()[0] if self.sync_lag else None
+        if newest is not None:
+            # late commits: ids below the watermark that were not visible at the last sync
+            new = or_(new, s.created_at >= newest - self.sync_lag)
+        cursor = 0
+        with self.bind.connect() as conn:
+            while True:
+                rows = conn.execute(
+                    select(s.id, s.product_id, s.qty, s.unit_price, s.created_at)
+                    .where(new, s.id > cursor)
+                    .order_by(s.id)
+                    .limit(SYNC_CHUNK)
+                ).all()
+                if not rows:
+                    break
+                if newest is not None:
+                    self._load_new_sales(rows)
+                else:
+                    self._bulk_load("sales", rows)
+                cursor = rows[-1][0]
+            p = models.Product
+            products = conn.execute(select(p.id, p.name, p.category)).all()
+        self.con.execute("DELETE FROM products")
+        self._bulk_load("products", products)
+
+    def _load_new_sales(self, rows) -> None:
+        # re-read rows overlap the copy; stage them and keep only unseen ids
+        self.con.execute("CREATE TEMP TABLE IF NOT EXISTS sales_new AS FROM sales LIMIT 0")
+        self.con.execute("DELETE FROM sales_new")
+        self._bulk_load("sales_new", rows)
+        self.con.execute("INSERT OR IGNORE INTO sales SELECT * FROM sales_new")
+
+    def _sync_archive(self) -> None:
+        # one read transaction, so the archive state, rollup and late sales agree
+        with Session(self.bind) as db:
+            am = models.ArchivedMonth
+            state = tuple(tuple(r) for r in db.execute(select(am.month, am.rows).order_by(am.month)))
+            if state == self._archived:
+                return
+            before = archive.archived_before(db)
+            live = []
+            if before is not None:
+                # late sales for an archived month stay in `sales` until the next archive run
+                s = models.Sale
+                live = list(db.execute(select(s.id).where(s.created_at < before)).scalars())
+            d = models.SaleDaily
+            rollup = db.execute(select(d.day, d.product_id, d.qty, d.revenue)).all()
+        if before is not None:
+            self.con.execute("DELETE FROM sales WHERE created_at < ? AND NOT list_contains(?, id)", [before, live])
+        self.con.execute("DELETE FROM sales_daily")
+        self._bulk_load("sales_daily", rollup)
+        self._archived = state
+
+    def _bulk_load(self, table: str, rows) -> None:
+        # DuckDB's executemany is row-at-a-time; COPY from a CSV chunk is orders of magnitude faster
+        if not rows:
+            return
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        try:
+            with os.fdopen(fd, "w", newline="") as f:
+                csv.writer(f).writerows(rows)
+            self.con.execute(f"COPY {table} FROM '{path}' (HEADER false)")
+        finally:
+            os.remove(path)
+
+    def _query(self, sql: str, params: list) -> List[Tuple]:
+        self.sync()
+        cur = self.con.cursor()  # per-call cursor: DuckDB connections are not shared across threads
+        try:
+            return cur.execute(sql, params).fetchall()
+        finally:
+            cur.close()
+
+    # ----- reports (same row shapes as the SQLAlchemy queries in reports.py)
+    def sales_series(self, start: date) -> List[Tuple]:
+        # a day can appear twice (live and archived); the router adds them up like on the SQL path
+        return self._query(
+            f"SELECT CAST(s.created_at AS DATE) AS d, COALESCE({_REVENUE}, 0.0) AS total"
+            " FROM sales s WHERE s.created_at >= ? GROUP BY 1"
+            " UNION ALL SELECT day, SUM(revenue) FROM sales_daily WHERE day >= ? GROUP BY 1 ORDER BY 1",
+            [start, start],
+        )
+
+    def top_products(self, limit: int) -> List[Tuple]:
+        return self._query(
+            "SELECT p.name, SUM(r.revenue) AS revenue FROM ("
+            f" SELECT s.product_id, {_REVENUE} AS revenue FROM sales s GROUP BY 1"
+            " UNION ALL SELECT product_id, SUM(revenue) FROM sales_daily GROUP BY 1"
+            ") r JOIN products p ON p.id = r.product_id"
+            " GROUP BY p.id, p.name ORDER BY 2 DESC LIMIT ?",
+            [limit],
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend() -> DuckAnalytics:
+    global _backend
+    tenant = current_tenant.get()
+    if tenant is not None:
+        # per shop; a file path is only shared-safe with a {tenant} placeholder
+        path = ANALYTICS_DUCKDB_PATH.format(tenant=tenant.name) if "{tenant}" in ANALYTICS_DUCKDB_PATH else ":memory:"
+        return tenant.state("analytics", lambda t: DuckAnalytics(path, bind=t.engine))
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = DuckAnalytics()
+    return _backend
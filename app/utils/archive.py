@@ -0,0 +1,130 @@
+# app/utils/archive.py
+"""Move old months of ``sales`` into compressed files.
+
+Each archived month is written to ``ARCHIVE_DIR/sales-YYYY-MM.csv.gz``, rolled
+up into ``sales_daily`` (per day and product) and deleted from ``sales``,
+in one transaction per month. Reports read the rollup for archived ranges,
+so totals are unchanged while the hot table only holds recent months.
+"""
+import csv
+import gzip
+import os
+from datetime import date, datetime
+from typing import List
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import current_tenant, upsert_insert
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "./archive")
+ARCHIVE_KEEP_MONTHS = int(os.getenv("ARCHIVE_KEEP_MONTHS", "12"))
+
+_COLUMNS = ("id", "product_id", "qty", "unit_price", "is_credit", "customer_name", "created_at")
+
+
+def default_dir() -> str:
+    # one folder per shop with TENANCY=1, so file names can't collide
+    tenant = current_tenant.get()
+    return os.path.join(ARCHIVE_DIR, tenant.name) if tenant is not None else ARCHIVE_DIR
+
+
+def _add_months(d: date, n: int) -> date:
+    y, m = divmod(d.month - 1 + n, 12)
+    return date(d.year + y, m + 1, 1)
+
+
+def cutoff(keep_months: int = ARCHIVE_KEEP_MONTHS, today: date = None) -> datetime:
+    """Start of the oldest month that stays in ``sales`` (the current month always stays)."""
+    today = today or date.today()
+    first = _add_months(today.replace(day=1), -max(keep_months - 1, 0))
+    return datetime.combine(first, datetime.min.time())
+
+
+def archive_month(db: Session, month: date, directory: str = None) -> models.ArchivedMonth:
+    s = models.Sale
+    start = datetime.combine(month, datetime.min.time())
+    end = datetime.combine(_add_months(month, 1), datetime.min.time())
+    in_month = (s.created_at >= start, s.created_at < end)
+    label = month.strftime("%Y-%m")
+    directory = directory or default_dir()
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"sales-{label}.csv.gz")
+    n = 1
+    while os.path.exists(path):             # late sales for an already archived month
+        n += 1
+        path = os.path.join(directory, f"sales-{label}-{n}.csv.gz")
+
+    rows = revenue = 0
+    with gzip.open(path, "wt", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(_COLUMNS)
+        cols = [getattr(s, c) for c in _COLUMNS]
+        for r in db.execute(select(*cols).where(*in_month).order_by(s.id)).yield_per(10_000):
+            w.writerow(r)
+            rows += 1
+            revenue += r.qty * r.unit_price
+
+    day = func.date(s.created_at)
+    rollup = (
+        select(day, s.product_id, func.sum(s.qty), func.sum(s.qty * s.unit_price))
+        .where(*in_month)
+        .group_by(day, s.product_id)
+    )
+    d = models.SaleDaily
+    insert = upsert_insert(db)
+    if insert is not None:
+        stmt = insert(d).from_select(["day", "product_id", "qty", "revenue"], rollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[d.day, d.product_id],
+            set_={"qty": d.qty + stmt.excluded.qty, "revenue": d.revenue + stmt.excluded.revenue},
+        )
+        db.execute(stmt)
+    else:
+        for dd, pid, qty, rev in db.execute(rollup).all():
+            dd = dd if isinstance(dd, date) else date.fromisoformat(str(dd))
+            row = db.get(d, (dd, pid)) or models.SaleDaily(day=dd, product_id=pid, qty=0, revenue=0.0)
+            row.qty += qty
+            row.revenue += rev
+            db.add(row)
+
+    db.execute(delete(s).where(*in_month))
+    am = db.get(models.ArchivedMonth, label)
+    if am is None:
+        am = models.ArchivedMonth(month=label, rows=0, revenue=0.0, path=path)
+        db.add(am)
+    am.rows += rows
+    am.revenue += revenue
+    am.path = path
+    db.commit()
+    return am
+
+
+def run(db: Session, keep_months: int = ARCHIVE_KEEP_MONTHS, directory: str = None) -> List[models.ArchivedMonth]:
+    """Archive every month older than the retention window that still has sales."""
+    limit = cutoff(keep_months)
+    oldest = db.query(func.min(models.Sale.created_at)).filter(models.Sale.created_at < limit).scalar()
+    if oldest is None:
+        return []
+    if not isinstance(oldest, datetime):
+        oldest = datetime.fromisoformat(str(oldest))
+    done = []
+    month = oldest.date().replace(day=1)
+    while month < limit.date():
+        if db.query(models.Sale.id).filter(
+            models.Sale.created_at >= datetime.combine(month, datetime.min.time()),
+            models.Sale.created_at < datetime.combine(_add_months(month, 1), datetime.min.time()),
+        ).first():
+            done.append(archive_month(db, month, directory))
+        month = _add_months(month, 1)
+    return done
+
+
+def archived_before(db: Session) -> datetime | None:
+    """End of the newest archived month, i.e. where the rollup stops being needed."""
+    latest = db.query(func.max(models.ArchivedMonth.month)).scalar()
+    if latest is None:
+        return None
+    return datetime.combine(_add_months(date.fromisoformat(latest + "-01"), 1), datetime.min.time())
@@ -0,0 +1,176 @@
+# app/utils/backtest.py
+"""Rolling-origin backtests of the forecast models.
+
+For each product the model's recurrence is run once over the history,
+recording its state after every observation; the forecasts from every
+origin and horizon are then scored together with array operations.
+Products are spread over a process pool. The pool is started once with
+the ``spawn`` method and reused: forking a server process copies its
+threads' locks and open connections into the children.
+"""
+import multiprocessing
+import os
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.utils import seasonal
+from app.utils.forecasting import holt_step
+
+MODELS = ("holt", "holt_winters")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def load_series(db: Session, model: str, product_ids: Optional[Sequence[int]] = None) -> Dict[int, List[float]]:
+    """The series each model is fitted on: per-sale quantities (holt) or zero-filled daily units."""
+    s = models.Sale
+    out: Dict[int, List[float]] = defaultdict(list)
+    if model == "holt":
+        q = select(s.product_id, s.qty).order_by(s.product_id, s.created_at, s.id)
+        if product_ids:
+            q = q.where(s.product_id.in_(product_ids))
+        for pid, qty in db.execute(q).yield_per(50_000):
+            out[pid].append(float(qty or 0))
+        return dict(out)
+
+    # complete days only, like the forecast endpoint: today's partial day is not an observation
+    today = datetime.combine(date.today(), time.min)
+    day = func.date(s.created_at)
+    q = (
+        select(s.product_id, day, func.sum(s.qty))
+        .where(s.created_at < today)
+        .group_by(s.product_id, day)
+        .order_by(s.product_id, day)
+    )
+    if product_ids:
+        q = q.where(s.product_id.in_(product_ids))
+    d = models.SaleDaily
+    archived = select(d.product_id, d.day, d.qty)
+    if product_ids:
+        archived = archived.where(d.product_id.in_(product_ids))
+    days: Dict[int, Dict[str, float]] = defaultdict(dict)
+    for rows in (db.execute(archived), db.execute(q)):
+        for pid, day_, qty in rows:
+            days[pid][str(day_)] = days[pid].get(str(day_), 0.0) + float(qty or 0)
+    for pid, by_day in days.items():
+        idx = np.array(sorted(by_day), dtype="datetime64[D]")
+        filled = np.zeros(int((idx[-1] - idx[0]).astype(int)) + 1)
+        filled[(idx - idx[0]).astype(int)] = [by_day[k] for k in sorted(by_day)]
+        out[pid] = filled.tolist()
+    return dict(out)
+
+
+def _holt_paths(y: np.ndarray):
+    L, T = np.empty(y.size), np.empty(y.size)
+    level, trend = y[0], y[1] - y[0]  # same start as holt_additive
+    for t, v in enumerate(y):
+        level, trend = holt_step(level, trend, v)
+        L[t], T[t] = level, trend
+    return L, T
+
+
+def score(series: List[float], model: str, horizon: int, min_train: int) -> Optional[dict]:
+    """Error sums over every origin t >= min_train-1 with a full horizon ahead."""
+    y = np.asarray(series, dtype=float)
+    n_origins = y.size - horizon - min_train + 1
+    if n_origins <= 0 or y.size < 2:
+        return None
+    origins = np.arange(min_train - 1, min_train - 1 + n_origins)    # last observed index
+    h = np.arange(1, horizon + 1)
+    actual = y[origins[:, None] + h[None, :]]                        # (O, H)
+
+    if model == "holt":
+        L, T = _holt_paths(y)
+        pred = L[origins, None] + h[None, :] * T[origins, None]
+    else:
+        m = seasonal.SEASON
+        if min_train < 2 * m:
+            return None
+        # parameters are chosen on the first training window only, then held fixed
+        fit = seasonal.fit_batch(y[None, :min_train], m)
+        L, T, S = seasonal.state_path(y, float(fit.alpha[0]), float(fit.beta[0]), float(fit.gamma[0]), m)
+        season_idx = (origins[:, None] + h[None, :]) % m
+        pred = L[origins, None] + h[None, :] * T[origins, None] + S[origins[:, None], season_idx]
+        pred = np.clip(pred, 0.0, None)
+
+    err = pred - actual
+    nonzero = actual != 0
+    return {
+        "n": int(err.size),
+        "abs": float(np.abs(err).sum()),
+        "bias": float(err.sum()),
+        "ape": float((np.abs(err[nonzero]) / np.abs(actual[nonzero])).sum()),
+        "n_nonzero": int(nonzero.sum()),
+    }
+
+
+def _metrics(sums: dict) -> dict:
+    n = sums["n"]
+    return {
+        "n": n,
+        "mae": sums["abs"] / n if n else 0.0,
+        "mape": 100.0 * sums["ape"] / sums["n_nonzero"] if sums["n_nonzero"] else None,
+        "bias": sums["bias"] / n if n else 0.0,
+    }
+
+
+def _score_chunk(args):
+    items, model, horizon, min_train = args
+    return [(pid, score(series, model, horizon, min_train)) for pid, series in items]
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run(series_by_product: Dict[int, List[float]], model: str, horizon: int, min_train: int,
+        workers: Optional[int] = None) -> dict:
+    items = list(series_by_product.items())
+    workers = workers or int(os.getenv("BACKTEST_WORKERS", "0")) or os.cpu_count() or 1
+    if workers <= 1 or len(items) < 50:
+        results = _score_chunk((items, model, horizon, min_train))
+    else:
+        size = max(1, len(items) // (workers * 4))
+        chunks = [(items[i:i + size], model, horizon, min_train) for i in range(0, len(items), size)]
+        pool = _executor(workers)
+        try:
+            results = [r for part in pool.map(_score_chunk, chunks) for r in part]
+        except BrokenProcessPool:
+            shutdown()      # a worker died; start a fresh pool on the next call
+            raise
+
+    total = {"n": 0, "abs": 0.0, "bias": 0.0, "ape": 0.0, "n_nonzero": 0}
+    products = []
+    for pid, sums in results:
+        if sums is None:
+            continue
+        for k in total:
+            total[k] += sums[k]
+        products.append({"product_id": pid, **_metrics(sums)})
+    return {"model": model, "horizon_days": horizon, "products": products, "aggregate": _metrics(total)}
@@ -0,0 +1,267 @@
+# app/utils/cache.py
+"""Pluggable key/value cache with pub/sub, shared by all workers of a deployment.
+
+Selected by ``CACHE_URL``:
+
+* ``memory://``            – in-process, for a single worker (default)
+* ``file:///path/cache.db`` – SQLite file shared by the processes on one host;
+                              a dependency-free stand-in for Redis in tests
+* ``redis://host:6379/0``  – multi-node (``pip install redis``)
+
+Values must be JSON-serializable. Subscribers are called from a background
+thread (synchronously for ``memory://``). Expired entries are swept every
+``SWEEP_SECONDS`` on writes; ``memory://`` also drops its oldest writes
+beyond ``CACHE_MAX_ENTRIES``.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "100000"))
+SWEEP_SECONDS = 60.0
+
+Callback = Callable[[Any], None]
+
+log = logging.getLogger(__name__)
+
+
+def _dispatch(callbacks: List[Callback], channel: str, message: Any) -> None:
+    # one failing subscriber must not stop the others, the poller thread or the publisher
+    for cb in list(callbacks):
+        try:
+            cb(message)
+        except Exception:
+            log.exception("cache subscriber %r failed on channel %s", cb, channel)
+
+
+class Cache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Any: ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def add(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set only if absent; True when this call stored the value."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def publish(self, channel: str, message: Any) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, channel: str, callback: Callback) -> None: ...
+
+    def unsubscribe(self, channel: str, callback: Callback) -> None:
+        subs = self._subs.get(channel, [])
+        if callback in subs:
+            subs.remove(callback)
+
+
+class MemoryCache(Cache):
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: Dict[str, tuple] = {}
+        self._subs: Dict[str, List[Callback]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def _live(self, key: str):
+        item = self._data.get(key)
+        if item and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item
+
+    def _store(self, key: str, value, ttl) -> None:
+        # called with the lock held; re-inserting keeps the dict ordered by last write
+        now = time.monotonic()
+        self._data.pop(key, None)
+        self._data[key] = (value, now + ttl if ttl else None)
+        if now - self._swept_at >= SWEEP_SECONDS:
+            self._swept_at = now
+            for k in [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]:
+                del self._data[k]
+        while len(self._data) > self.max_entries:
+            del self._data[next(iter(self._data))]
+
+    def get(self, key):
+        with self._lock:
+            item = self._live(key)
+            return item[0] if item else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def publish(self, channel, message):
+        _dispatch(self._subs[channel], channel, message)
+
+    def subscribe(self, channel, callback):
+        self._subs[channel].append(callback)
+
+
+class FileCache(Cache):
+    POLL_SECONDS = 0.05
+    MESSAGE_TTL = 60.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._subs: Dict[str, List[Callback]] = defaultdict(list)
+        self._poller: Optional[threading.Thread] = None
+        self._swept_at = time.time()
+        con = self._con()
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires)")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS messages"
+            " (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT, payload TEXT, ts REAL)"
+        )
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._local.con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        return con
+
+    def _sweep(self, con: sqlite3.Connection, now: float) -> None:
+        # every process sweeps on its own clock; overlapping sweeps are harmless
+        if now - self._swept_at >= SWEEP_SECONDS:
+            self._swept_at = now
+            con.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+
+    def get(self, key):
+        row = self._con().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        con = self._con()
+        now = time.time()
+        con.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, json.dumps(value), now + ttl if ttl else None))
+        self._sweep(con, now)
+
+    def add(self, key, value, ttl=None):
+        con = self._con()
+        now = time.time()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("DELETE FROM kv WHERE key = ? AND expires <= ?", (key, now))
+            cur = con.execute(
+                "INSERT OR IGNORE INTO kv VALUES (?, ?, ?)", (key, json.dumps(value), now + ttl if ttl else None)
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        self._sweep(con, now)
+        return cur.rowcount == 1
+
+    def delete(self, key):
+        self._con().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def publish(self, channel, message):
+        now = time.time()
+        con = self._con()
+        con.execute("INSERT INTO messages (channel, payload, ts) VALUES (?, ?, ?)", (channel, json.dumps(message), now))
+        con.execute("DELETE FROM messages WHERE ts < ?", (now - self.MESSAGE_TTL,))
+
+    def subscribe(self, channel, callback):
+        self._subs[channel].append(callback)
+        if self._poller is None:
+            last = self._con().execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+            self._poller = threading.Thread(target=self._poll, args=(last,), daemon=True, name="cache-subscriber")
+            self._poller.start()
+
+    def _poll(self, last: int) -> None:
+        con = self._con()
+        while True:
+            rows = con.execute(
+                "SELECT id, channel, payload FROM messages WHERE id > ? ORDER BY id", (last,)
+            ).fetchall()
+            for last, channel, payload in rows:
+                _dispatch(self._subs.get(channel, []), channel, json.loads(payload))
+            time.sleep(self.POLL_SECONDS)
+
+
+class RedisCache(Cache):
+    def __init__(self, url: str):
+        import redis  # optional dependency
+
+        self.r = redis.Redis.from_url(url)
+        self._pubsub = None
+        self._subs: Dict[str, List[Callback]] = defaultdict(list)
+
+    def get(self, key):
+        raw = self.r.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl=None):
+        self.r.set(key, json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.r.set(key, json.dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def delete(self, key):
+        self.r.delete(key)
+
+    def publish(self, channel, message):
+        self.r.publish(channel, json.dumps(message))
+
+    def subscribe(self, channel, callback):
+        self._subs[channel].append(callback)
+        if self._pubsub is None:
+            self._pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{channel: self._dispatch})
+        if not getattr(self, "_thread", None):
+            self._thread = self._pubsub.run_in_thread(sleep_time=0.05, daemon=True)
+
+    def _dispatch(self, msg) -> None:
+        channel = msg["channel"].decode() if isinstance(msg["channel"], bytes) else msg["channel"]
+        _dispatch(self._subs[channel], channel, json.loads(msg["data"]))
+
+
+def from_url(url: str) -> Cache:
+    if url.startswith("memory://"):
+        return MemoryCache()
+    if url.startswith("file://"):
+        return FileCache(url[len("file://"):])
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported CACHE_URL: {url}")
+
+
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Cache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = from_url(CACHE_URL)
+    return _cache
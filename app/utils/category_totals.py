@@ -0,0 +1,126 @@
+# app/utils/category_totals.py
+"""Revenue per category and day, kept in step with ``sales`` and ``products``.
+
+``record_sale`` runs in the sale's transaction. A product whose category
+changes carries its whole history along (``move_product``), so the
+category-share report is a small indexed read over ``category_daily`` for
+any window and never shifts after an edit.
+"""
+from datetime import date
+from typing import Iterable, Optional
+
+from sqlalchemy import func, select, text, union_all, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import upsert_insert
+
+# spelled out because SQLAlchemy does not cache compiled ON CONFLICT statements,
+# and this one runs for every sale
+_RECORD_SALE = text(
+    "INSERT INTO category_daily (day, category, qty, revenue)"
+    " SELECT date(s.created_at), p.category, s.qty, s.qty * s.unit_price"
+    " FROM sales s JOIN products p ON p.id = s.product_id WHERE s.id = :sale_id"
+    " ON CONFLICT (day, category) DO UPDATE SET qty = category_daily.qty + excluded.qty,"
+    " revenue = category_daily.revenue + excluded.revenue"
+)
+
+
+def _upsert(db: Session, rows: Iterable[dict]) -> None:
+    """Add ``{"day", "category", "qty", "revenue"}`` deltas."""
+    rows = list(rows)
+    if not rows:
+        return
+    cd = models.CategoryDaily
+    insert = upsert_insert(db)
+    if insert is not None:
+        stmt = insert(cd)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cd.day, cd.category],
+            set_={"qty": cd.qty + stmt.excluded.qty, "revenue": cd.revenue + stmt.excluded.revenue},
+        )
+        db.execute(stmt, rows)
+        return
+    for r in rows:
+        changed = db.execute(
+            update(cd)
+            .where(cd.day == r["day"], cd.category == r["category"])
+            .values(qty=cd.qty + r["qty"], revenue=cd.revenue + r["revenue"])
+        ).rowcount
+        if not changed:
+            db.add(cd(**r))
+            db.flush()
+
+
+def record_sale(db: Session, sale_id: int) -> None:
+    """Fold one flushed sale into its category/day (the day is computed by the database)."""
+    if upsert_insert(db) is not None:
+        db.execute(_RECORD_SALE, {"sale_id": sale_id})
+        return
+    s, p = models.Sale, models.Product
+    src = (
+        select(func.date(s.created_at), p.category, s.qty, s.qty * s.unit_price)
+        .join(p, p.id == s.product_id)
+        .where(s.id == sale_id)
+    )
+    _upsert(db, [
+        {"day": _day(d), "category": c, "qty": q, "revenue": r} for d, c, q, r in db.execute(src)
+    ])
+
+
+def _day(d) -> date:
+    return d if isinstance(d, date) else date.fromisoformat(str(d))
+
+
+def _product_days(db: Session, product_id: int):
+    s, sd = models.Sale, models.SaleDaily
+    day = func.date(s.created_at)
+    live = (
+        select(day.label("day"), func.sum(s.qty).label("qty"), func.sum(s.qty * s.unit_price).label("revenue"))
+        .where(s.product_id == product_id)
+        .group_by(day)
+    )
+    archived = select(sd.day, sd.qty, sd.revenue).where(sd.product_id == product_id)
+    return db.execute(union_all(live, archived)).all()
+
+
+def move_product(db: Session, product_id: int, old: Optional[str], new: Optional[str]) -> None:
+    """Move a product's revenue history from category ``old`` to ``new`` (None: removed)."""
+    if old == new:
+        return
+    rows = []
+    for d, qty, revenue in _product_days(db, product_id):
+        d = _day(d)
+        if old is not None:
+            rows.append({"day": d, "category": old, "qty": -int(qty or 0), "revenue": -float(revenue or 0.0)})
+        if new is not None:
+            rows.append({"day": d, "category": new, "qty": int(qty or 0), "revenue": float(revenue or 0.0)})
+    _upsert(db, rows)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute the table from sales and the archived rollup. Returns the number of rows."""
+    s, sd, p, cd = models.Sale, models.SaleDaily, models.Product, models.CategoryDaily
+    db.query(cd).delete()
+    day = func.date(s.created_at)
+    live = select(day.label("day"), s.product_id.label("product_id"), s.qty.label("qty"),
+                  (s.qty * s.unit_price).label("revenue"))
+    archived = select(sd.day, sd.product_id, sd.qty, sd.revenue)
+    u = union_all(live, archived).subquery()
+    q = (
+        select(u.c.day, p.category, func.sum(u.c.qty), func.sum(u.c.revenue))
+        .join(p, p.id == u.c.product_id)
+        .group_by(u.c.day, p.category)
+    )
+    rows = [{"day": _day(d), "category": c, "qty": int(n or 0), "revenue": float(r or 0.0)} for d, c, n, r in db.execute(q)]
+    _upsert(db, rows)
+    db.commit()
+    return len(rows)
+
+
+def ensure_built(db: Session) -> None:
+    # first start after the table was introduced: seed it from existing sales
+    if db.query(models.CategoryDaily).first() is None and (
+        db.query(models.Sale.id).first() is not None or db.query(models.SaleDaily.day).first() is not None
+    ):
+        rebuild(db)
@@ -0,0 +1,193 @@
+# app/utils/demand.py
+"""Daily demand per product over the last ``DEMAND_DAYS`` complete days.
+
+Each product keeps a ring of ``DEMAND_DAYS + 1`` daily quantities (the
+window plus today) and the window's mean and sum of squared deviations. A
+sale adds to its day's slot. When a day completes it enters the window and
+the oldest day leaves it. Both are one Welford replace step, so mean and
+variance are never recomputed from the history. Products are advanced
+lazily when they are next touched or read.
+
+Enable with ``DEMAND_STATS=1``. The store is seeded from the database at
+startup and fed by sale events afterwards. Without it, the replenishment
+endpoint builds the same window with one grouped query.
+"""
+import math
+import os
+import threading
+from array import array
+from datetime import date, datetime, time, timedelta
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import current_tenant
+from app.utils import sale_events
+
+DEMAND_STATS = os.getenv("DEMAND_STATS", "0") == "1"
+DEMAND_DAYS = int(os.getenv("DEMAND_DAYS", "28"))
+LEAD_TIME_DAYS = int(os.getenv("LEAD_TIME_DAYS", "7"))
+
+
+class _Product:
+    __slots__ = ("qty", "newest", "mean", "m2")
+
+    def __init__(self, slots: int, today: int):
+        self.qty = array("d", [0.0] * slots)
+        self.newest = today         # ordinal of the day in the "today" slot
+        self.mean = 0.0
+        self.m2 = 0.0
+
+
+class DemandStats(sale_events.SeededSubscriber):
+    def __init__(self, days: int = DEMAND_DAYS, tenant: Optional[str] = None):
+        super().__init__(tenant)
+        self.days = days
+        self.slots = days + 1
+        self.products: Dict[int, _Product] = {}
+        self._lock = threading.Lock()
+
+    def _replace(self, pd: _Product, old: float, new: float) -> None:
+        # Welford update for a fixed-size window where one value changes from `old` to `new`
+        delta = new - old
+        if not delta:
+            return
+        mean_old = pd.mean
+        pd.mean += delta / self.days
+        pd.m2 = max(pd.m2 + delta * (new - pd.mean + old - mean_old), 0.0)
+
+    def _advance(self, pd: _Product, today: int) -> None:
+        if today - pd.newest > self.days:
+            # the whole window has gone quiet
+            pd.qty = array("d", [0.0] * self.slots)
+            pd.mean = pd.m2 = 0.0
+            pd.newest = today
+            return
+        while pd.newest < today:
+            reused = (pd.newest + 1) % self.slots        # holds the day that leaves the window
+            self._replace(pd, pd.qty[reused], pd.qty[pd.newest % self.slots])
+            pd.qty[reused] = 0.0
+            pd.newest += 1
+
+    def add(self, product_id: int, qty: float, day: date) -> None:
+        today = date.today().toordinal()
+        d = min(day.toordinal(), today)
+        with self._lock:
+            pd = self.products.get(product_id)
+            if pd is None:
+                pd = self.products[product_id] = _Product(self.slots, today)
+            self._advance(pd, today)
+            if d <= pd.newest - self.slots:
+                return                                  # older than the window
+            i = d % self.slots
+            old = pd.qty[i]
+            pd.qty[i] = old + qty
+            if d < pd.newest:                           # a completed day: part of the window
+                self._replace(pd, old, old + qty)
+
+    def _std(self, pd: _Product) -> float:
+        return math.sqrt(pd.m2 / (self.days - 1)) if self.days > 1 else 0.0
+
+    def stats(self) -> Dict[int, Tuple[float, float]]:
+        """``{product_id: (mean, std)}`` of daily demand for every product sold in the window."""
+        today = date.today().toordinal()
+        with self._lock:
+            out = {}
+            for pid, pd in self.products.items():
+                self._advance(pd, today)
+                out[pid] = (pd.mean, self._std(pd))
+            return out
+
+    def profile(self, product_id: int) -> Tuple[float, float, List[Tuple[date, float]], float]:
+        """Mean, std, the window's daily quantities (oldest first) and today's quantity so far."""
+        today = date.today().toordinal()
+        with self._lock:
+            pd = self.products.get(product_id)
+            if pd is None:
+                series = [(date.fromordinal(d), 0.0) for d in range(today - self.days, today)]
+                return 0.0, 0.0, series, 0.0
+            self._advance(pd, today)
+            series = [(date.fromordinal(d), pd.qty[d % self.slots]) for d in range(today - self.days, today)]
+            return pd.mean, self._std(pd), series, pd.qty[today % self.slots]
+
+    # ----- feeding
+    def load(self, db: Session, product_id: Optional[int] = None, max_id: Optional[int] = None) -> None:
+        s = models.Sale
+        since = datetime.combine(date.today() - timedelta(days=self.days), time.min)
+        day = func.date(s.created_at)
+        q = select(s.product_id, day, func.sum(s.qty)).where(s.created_at >= since)
+        if product_id is not None:
+            q = q.where(s.product_id == product_id)
+        if max_id is not None:
+            q = q.where(s.id <= max_id)
+        q = q.group_by(day, s.product_id)
+        for pid, d, qty in db.execute(q):
+            self.add(pid, float(qty or 0), d if isinstance(d, date) else date.fromisoformat(str(d)))
+
+    def load_seed(self, db: Session, max_id: int) -> None:
+        self.load(db, max_id=max_id)
+
+    def apply(self, event: dict) -> None:
+        self.add(event["product_id"], event["qty"], datetime.fromisoformat(event["created_at"]).date())
+
+
+store: Optional[DemandStats] = None
+
+
+def start(db: Session) -> None:
+    global store
+    s = DemandStats()
+    s.start(db)
+    store = s
+
+
+def _start_for(tenant) -> DemandStats:
+    s = DemandStats(tenant=tenant.name)
+    with tenant.session() as db:
+        s.start(db)
+    return s
+
+
+def current() -> Optional[DemandStats]:
+    """The store for the shop being served (seeded on its first use), or the default one."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return store
+    return tenant.state("demand", _start_for) if DEMAND_STATS else None
+
+
+def replenishment(db: Session, stats: DemandStats, lead_time_days: int, cover_days: int,
+                  service_level: float) -> List[dict]:
+    """Days of cover and a suggested order for every product, most urgent first.
+
+    Safety stock is ``z * std * sqrt(lead time)``. A product is reordered once
+    its stock is at or below the larger of its ``reorder_point`` and the
+    demand over the lead time plus safety stock. The order brings it up to
+    ``cover_days`` of demand beyond the lead time.
+    """
+    z = NormalDist().inv_cdf(service_level)
+    by_product = stats.stats()
+    p = models.Product
+    out = []
+    for pid, name, stock, reorder_point in db.execute(select(p.id, p.name, p.stock, p.reorder_point)):
+        mean, std = by_product.get(pid, (0.0, 0.0))
+        safety = z * std * math.sqrt(lead_time_days)
+        reorder_at = max(int(reorder_point or 0), math.ceil(mean * lead_time_days + safety))
+        target = max(mean * (lead_time_days + cover_days) + safety, reorder_at)
+        suggested = math.ceil(target - stock) if stock <= reorder_at and target > stock else 0
+        out.append({
+            "product_id": pid,
+            "name": name,
+            "stock": stock,
+            "reorder_point": reorder_point,
+            "avg_daily": round(mean, 4),
+            "std_daily": round(std, 4),
+            "days_of_cover": round(stock / mean, 1) if mean > 0 else None,
+            "reorder_at": reorder_at,
+            "suggested_qty": suggested,
+        })
+    out.sort(key=lambda r: (r["days_of_cover"] is None, r["days_of_cover"] or 0.0, -r["suggested_qty"]))
+    return out
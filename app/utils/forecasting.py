@@ -1,17 +1,30 @@
 from datetime import date, timedelta
-from typing import List
+from typing import List, Tuple
 import math
 
-def holt_additive(series: List[float], horizon: int, alpha=0.6, beta=0.3) -> List[float]:
-    # simple Holt linear trend (additive) fallback – no external deps
-    if not series: return [0.0] * horizon
+ALPHA, BETA = 0.6, 0.3
+
+def holt_step(level: float, trend: float, y: float, alpha=ALPHA, beta=BETA) -> Tuple[float, float]:
+    # one step of the Holt recurrence – O(1), so the state can be advanced per observation
+    prev_level = level
+    level = alpha * y + (1 - alpha) * (level + trend)
+    trend = beta * (level - prev_level) + (1 - beta) * trend
+    return level, trend
+
+def holt_fit(series: List[float], alpha=ALPHA, beta=BETA) -> Tuple[float, float]:
     level = series[0]
     trend = series[1] - series[0] if len(series) > 1 else 0.0
     for y in series:
-        prev_level = level
-        level = alpha * y + (1 - alpha) * (level + trend)
-        trend = beta * (level - prev_level) + (1 - beta) * trend
+        level, trend = holt_step(level, trend, y, alpha, beta)
+    return level, trend
+
+def holt_project(level: float, trend: float, horizon: int) -> List[float]:
     return [level + (i + 1) * trend for i in range(horizon)]
 
+def holt_additive(series: List[float], horizon: int, alpha=ALPHA, beta=BETA) -> List[float]:
+    # simple Holt linear trend (additive) fallback – no external deps
+    if not series: return [0.0] * horizon
+    return holt_project(*holt_fit(series, alpha, beta), horizon)
+
 def build_future_dates(start: date, horizon: int):
     return [(start + timedelta(days=i)).isoformat() for i in range(1, horizon + 1)]
@@ -0,0 +1,153 @@
+# app/utils/group_commit.py
+"""Group commit for high-frequency writes (``GROUP_COMMIT=1``).
+
+On SQLite every commit is an fsync, which caps standalone sale inserts at a
+few hundred per second. With group commit, request threads hand their write
+to ``submit`` and block. One writer thread per database collects the writes
+that arrive within ``GROUP_COMMIT_MS`` (at most ``GROUP_COMMIT_MAX``), runs
+them in one session and commits once. Each caller returns only after the
+commit that contains its write, so a response still means the write is
+durable. The cost is up to ``GROUP_COMMIT_MS`` of added latency.
+
+A write rejected with ``HTTPException`` fails alone, so it must raise before
+changing anything. Any other error rolls the batch back and replays its
+writes one transaction each, so one bad write cannot fail its neighbours.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal, current_tenant
+
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_MS = float(os.getenv("GROUP_COMMIT_MS", "5"))
+GROUP_COMMIT_MAX = int(os.getenv("GROUP_COMMIT_MAX", "64"))
+
+Work = Callable[[Session], Any]
+
+
+class GroupCommitter:
+    def __init__(self, session_factory, wait_ms: float = GROUP_COMMIT_MS, max_items: int = GROUP_COMMIT_MAX):
+        self.session_factory = session_factory
+        self.wait = wait_ms / 1000
+        self.max_items = max_items
+        self.batches = self.items = 0
+        self._queue: "queue.Queue[Optional[Tuple[Work, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, work: Work) -> Any:
+        """Run ``work(db)`` in the next batch; returns its result once the batch is committed."""
+        fut: Future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="group-commit", daemon=True)
+                self._thread.start()
+            self._queue.put((work, fut))
+        return fut.result()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.wait
+            stopping = False
+            while len(batch) < self.max_items:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run(batch)
+            if stopping:
+                return
+
+    def _run(self, batch: List[Tuple[Work, Future]]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        done: List[Tuple[Future, Any]] = []
+        # results are read by the request threads after the session is closed
+        with self.session_factory(expire_on_commit=False) as db:
+            try:
+                for work, fut in batch:
+                    try:
+                        done.append((fut, work(db)))
+                    except HTTPException as e:
+                        fut.set_exception(e)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                replay = [(w, f) for w, f in batch if not f.done()]
+                done = []
+            else:
+                replay = []
+        for fut, result in done:
+            fut.set_result(result)
+        for work, fut in replay:
+            self._run_alone(work, fut)
+
+    def _run_alone(self, work: Work, fut: Future) -> None:
+        with self.session_factory(expire_on_commit=False) as db:
+            try:
+                result = work(db)
+                db.commit()
+            except BaseException as e:
+                db.rollback()
+                fut.set_exception(e)
+                return
+        fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
+
+
+_default: Optional[GroupCommitter] = None
+_default_lock = threading.Lock()
+
+
+def current() -> GroupCommitter:
+    """The committer for the shop being served, or for the default database."""
+    global _default
+    tenant = current_tenant.get()
+    if tenant is not None:
+        return tenant.state("group_commit", lambda t: GroupCommitter(t.session, GROUP_COMMIT_MS, GROUP_COMMIT_MAX))
+    with _default_lock:
+        if _default is None:
+            _default = GroupCommitter(SessionLocal, GROUP_COMMIT_MS, GROUP_COMMIT_MAX)
+        return _default
+
+
+def shutdown() -> None:
+    """Flush and stop the default committer (tenant committers stop with their ``Tenant``)."""
+    global _default
+    with _default_lock:
+        committer, _default = _default, None
+    if committer is not None:
+        committer.stop()
@@ -0,0 +1,61 @@
+# app/utils/holt_state.py
+"""Persisted Holt state per product.
+
+``observe`` folds one sale into the stored level/trend in O(1), giving exactly
+what ``holt_additive`` would compute by replaying the whole history, so a
+forecast never has to read the sales table.
+"""
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.utils.forecasting import holt_fit, holt_project, holt_step
+
+
+def _advance(st: models.ForecastState, y: float) -> None:
+    if st.n == 0:
+        st.level, st.trend = y, 0.0          # first observation is kept in `level`
+    elif st.n == 1:
+        st.level, st.trend = holt_fit([st.level, y])
+    else:
+        st.level, st.trend = holt_step(st.level, st.trend, y)
+    st.n += 1
+
+
+def observe(db: Session, product_id: int, qty: float) -> None:
+    """Fold a new sale into the product's state (caller commits)."""
+    st = db.get(models.ForecastState, product_id, with_for_update=True)
+    if st is None:
+        st = models.ForecastState(product_id=product_id, level=0.0, trend=0.0, n=0)
+        db.add(st)
+    _advance(st, float(qty))
+
+
+def project(st: models.ForecastState, horizon: int) -> List[float]:
+    if st.n == 1:
+        return [float(st.level)] * horizon
+    return holt_project(st.level, st.trend, horizon)
+
+
+def refit(db: Session, product_id: Optional[int] = None) -> int:
+    """Rebuild state from the sales history (recovery). Returns products refitted."""
+    s = models.Sale
+    q = select(s.product_id, s.qty).order_by(s.product_id, s.created_at, s.id)
+    existing = db.query(models.ForecastState)
+    if product_id is not None:
+        q = q.where(s.product_id == product_id)
+        existing = existing.filter(models.ForecastState.product_id == product_id)
+    existing.delete(synchronize_session=False)
+
+    count = 0
+    st = None
+    for pid, qty in db.execute(q).yield_per(10_000):
+        if st is None or st.product_id != pid:
+            st = models.ForecastState(product_id=pid, level=0.0, trend=0.0, n=0)
+            db.add(st)
+            count += 1
+        _advance(st, float(qty or 0))
+    db.commit()
+    return count
@@ -0,0 +1,68 @@
+# app/utils/idempotency.py
+"""``Idempotency-Key`` support for create endpoints.
+
+The first request with a key claims it in the shared cache (``cache.add``)
+and runs; its response is stored for ``IDEMPOTENCY_TTL`` seconds. Retries
+with the same key are answered from the cache without touching the
+database. A duplicate that arrives while the first request is still running
+waits for it. Reusing a key with a different payload is rejected.
+Failed requests release the key: nothing was committed, so a retry may run
+again.
+"""
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.db import current_tenant
+from app.utils.cache import get_cache
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+PENDING_TTL = 30.0      # a claim left by a crashed worker expires after this
+WAIT_SECONDS = 10.0
+POLL_SECONDS = 0.02
+
+
+def fingerprint(payload: BaseModel) -> str:
+    raw = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(entry: dict) -> JSONResponse:
+    return JSONResponse(entry["body"], headers={"Idempotent-Replayed": "true"})
+
+
+def run(scope: str, key: Optional[str], payload: BaseModel, fn: Callable[[], BaseModel]):
+    if not key:
+        return fn()
+    cache = get_cache()
+    tenant = current_tenant.get()
+    ck = f"idem:{tenant.name if tenant is not None else ''}:{scope}:{key}"
+    fp = fingerprint(payload)
+    deadline = time.monotonic() + WAIT_SECONDS
+    while True:
+        if cache.add(ck, {"fp": fp, "body": None}, ttl=PENDING_TTL):
+            break
+        entry = cache.get(ck)
+        if entry is None:       # released or expired between add and get
+            continue
+        if entry["fp"] != fp:
+            raise HTTPException(422, "Idempotency-Key was already used with a different request body")
+        if entry["body"] is not None:
+            return _replay(entry)
+        if time.monotonic() >= deadline:
+            raise HTTPException(409, "A request with this Idempotency-Key is still in progress")
+        time.sleep(POLL_SECONDS)
+
+    try:
+        result = fn()
+    except BaseException:
+        cache.delete(ck)
+        raise
+    cache.set(ck, {"fp": fp, "body": result.model_dump(mode="json")}, ttl=IDEMPOTENCY_TTL)
+    return result
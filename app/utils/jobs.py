@@ -0,0 +1,284 @@
+# app/utils/jobs.py
+"""In-process background jobs with a persistent status table.
+
+``submit`` stores a ``jobs`` row and hands the work to a bounded thread pool
+(``JOB_WORKERS`` threads, at most ``JOB_QUEUE_LIMIT`` jobs waiting). The
+handler gets its own session and a ``progress(fraction, message)`` callback.
+Status, progress and the JSON result are written back to the row, so any
+worker can answer polls.
+
+Each row records the process that owns it, and that process refreshes
+``heartbeat_at`` every ``HEARTBEAT_SECONDS`` while the job is queued or
+running. The schema setup (at startup, and for each shop when its engine is
+opened; see app/bootstrap.py) marks a job ``interrupted`` only once its
+heartbeat is older than ``JOB_STALE_SECONDS``, so a starting worker leaves
+the jobs of its live siblings alone. Polling a single job applies the same
+check, so a job whose worker died stops reading as running. A job's
+final status is only written while it is still ``running``, so an
+interrupted job stays interrupted.
+"""
+import contextvars
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import func, or_, update
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.db import SessionLocal, current_engine, current_tenant
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+PROGRESS_EVERY = 0.5    # seconds between progress writes
+HEARTBEAT_SECONDS = 10.0
+
+log = logging.getLogger(__name__)
+
+ACTIVE = ("queued", "running")
+
+Progress = Callable[[float, Optional[str]], None]
+Handler = Callable[[Session, Any, Progress], Any]
+
+_handlers: Dict[str, Tuple[Handler, Type[BaseModel]]] = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_live: Dict[str, Any] = {}      # job id -> engine of its database, while queued or running here
+_heartbeat: Optional[threading.Thread] = None
+_owner: Tuple[int, str] = (0, "")
+_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    pass
+
+
+def job(kind: str, params: Type[BaseModel]):
+    """Register ``fn(db, params, progress)`` as the handler for ``kind``."""
+    def register(fn: Handler) -> Handler:
+        _handlers[kind] = (fn, params)
+        return fn
+    return register
+
+
+def kinds() -> Dict[str, Type[BaseModel]]:
+    return {k: p for k, (_, p) in _handlers.items()}
+
+
+def validate(kind: str, params: dict) -> BaseModel:
+    if kind not in _handlers:
+        raise KeyError(kind)
+    return _handlers[kind][1](**params)
+
+
+def owner() -> str:
+    """This process's id in ``Job.owner`` (a fork gets a new one)."""
+    global _owner
+    pid = os.getpid()
+    if _owner[0] != pid:
+        _owner = (pid, f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}")
+    return _owner[1]
+
+
+def _utcnow() -> datetime:
+    # heartbeats are written and compared in Python, so every dialect stores the same clock
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool, _heartbeat
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_beat, name="job-heartbeat", daemon=True)
+            _heartbeat.start()
+        return _pool
+
+
+def _beat() -> None:
+    while True:
+        time.sleep(HEARTBEAT_SECONDS)
+        by_bind = defaultdict(list)
+        with _lock:
+            for job_id, bind in _live.items():
+                by_bind[bind].append(job_id)
+        for bind, ids in by_bind.items():
+            try:
+                with SessionLocal(bind=bind) as db:
+                    db.execute(update(models.Job).where(models.Job.id.in_(ids)).values(heartbeat_at=_utcnow()))
+                    db.commit()
+            except Exception:
+                log.exception("job heartbeat failed; retrying in %.0f s", HEARTBEAT_SECONDS)
+
+
+def submit(db: Session, kind: str, params: BaseModel) -> models.Job:
+    global _pending
+    with _lock:
+        if _pending >= JOB_QUEUE_LIMIT:
+            raise QueueFull()
+        _pending += 1
+    tenant = current_tenant.get()
+    job_id = uuid.uuid4().hex
+    try:
+        row = models.Job(id=job_id, kind=kind, status="queued", progress=0.0,
+                         params=params.model_dump_json(), owner=owner(), heartbeat_at=_utcnow())
+        db.add(row)
+        db.commit(); db.refresh(row)
+        if tenant is not None:
+            tenant.retain()     # keep the shop's engine open until the job is done
+        pool = _executor()
+        with _lock:
+            _live[job_id] = current_engine()
+        # the job thread runs in a copy of this context, so it sees the same shop
+        pool.submit(contextvars.copy_context().run, _run, job_id, kind, params)
+    except BaseException:
+        with _lock:
+            _pending -= 1
+            _live.pop(job_id, None)
+        raise
+    return row
+
+
+def _set(job_id: str, only_if: Optional[str] = None, **values) -> bool:
+    """Update the job row; with ``only_if``, only while it has that status. True if a row changed."""
+    j = models.Job
+    stmt = update(j).where(j.id == job_id)
+    if only_if is not None:
+        stmt = stmt.where(j.status == only_if)
+    with SessionLocal(bind=current_engine()) as db:
+        res = db.execute(stmt.values(**values))
+        db.commit()
+    return res.rowcount > 0
+
+
+def _run(job_id: str, kind: str, params: BaseModel) -> None:
+    global _pending
+    last = 0.0
+
+    def progress(fraction: float, message: Optional[str] = None) -> None:
+        nonlocal last
+        now = time.monotonic()
+        if now - last >= PROGRESS_EVERY:
+            last = now
+            _set(job_id, progress=max(0.0, min(1.0, fraction)), message=message)
+
+    try:
+        # interrupted while it waited in the queue: leave it that way
+        if _set(job_id, only_if="queued", status="running", started_at=func.now()):
+            fn, _ = _handlers[kind]
+            with SessionLocal(bind=current_engine()) as db:
+                result = fn(db, params, progress)
+            _set(job_id, only_if="running", status="succeeded", progress=1.0,
+                 result=json.dumps(jsonable_encoder(result)), finished_at=func.now())
+    except Exception as e:
+        detail = getattr(e, "detail", None) or f"{type(e).__name__}: {e}"
+        _set(job_id, only_if="running", status="failed", error=str(detail), finished_at=func.now())
+    finally:
+        with _lock:
+            _pending -= 1
+            _live.pop(job_id, None)
+        tenant = current_tenant.get()
+        if tenant is not None:
+            tenant.release()
+
+
+def _stale(stale_seconds: float):
+    j = models.Job
+    return (
+        j.status.in_(ACTIVE),
+        or_(j.owner.is_(None), j.owner != owner()),
+        or_(j.heartbeat_at.is_(None), j.heartbeat_at < _utcnow() - timedelta(seconds=stale_seconds)),
+    )
+
+
+def mark_interrupted(db: Session, stale_seconds: float = JOB_STALE_SECONDS) -> int:
+    """Interrupt queued/running jobs whose owner stopped heartbeating (never this process's own)."""
+    res = db.execute(
+        update(models.Job).where(*_stale(stale_seconds)).values(status="interrupted", finished_at=func.now())
+    )
+    db.commit()
+    return res.rowcount
+
+
+def check_stale(db: Session, row: models.Job, stale_seconds: float = JOB_STALE_SECONDS) -> models.Job:
+    """Mark ``row`` interrupted if its owner stopped heartbeating, so a poll does not wait forever."""
+    if row.status in ACTIVE:
+        res = db.execute(
+            update(models.Job).where(models.Job.id == row.id, *_stale(stale_seconds))
+            .values(status="interrupted", finished_at=func.now())
+        )
+        db.commit()
+        if res.rowcount:
+            db.refresh(row)
+    return row
+
+
+def shutdown() -> None:
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ---------- handlers ----------
+
+@job("forecast", schemas.ForecastIn)
+def _forecast(db, params, progress):
+    from app.routers.forecast import forecast
+    return forecast(params, db)
+
+
+@job("forecast_batch", schemas.ForecastBatchIn)
+def _forecast_batch(db, params, progress):
+    from app.routers.forecast import forecast
+    ids = params.product_ids or [pid for (pid,) in db.query(models.Product.id).order_by(models.Product.id)]
+    out = []
+    for i, pid in enumerate(ids):
+        body = schemas.ForecastIn(product_id=pid, horizon_days=params.horizon_days, model=params.model)
+        out.append({"product_id": pid, **forecast(body, db)})
+        progress((i + 1) / len(ids), f"{i + 1}/{len(ids)} products")
+    return out
+
+
+@job("backtest", schemas.BacktestIn)
+def _backtest(db, params, progress):
+    from app.utils import backtest
+    series = backtest.load_series(db, params.model, params.product_ids)
+    progress(0.2, f"loaded {len(series)} series")
+    return backtest.run(series, params.model, params.horizon_days, params.min_train)
+
+
+@job("stock_snapshot", schemas.NoParams)
+def _stock_snapshot(db, params, progress):
+    from app.utils import stock
+    snap = stock.take_snapshot(db)
+    return {"id": snap.id, "products": snap.products, "last_movement_id": snap.last_movement_id}
+
+
+@job("archive", schemas.ArchiveIn)
+def _archive(db, params, progress):
+    from app.utils import archive
+    months = archive.run(db, params.keep_months or archive.ARCHIVE_KEEP_MONTHS)
+    return [{"month": m.month, "rows": m.rows, "revenue": m.revenue, "path": m.path} for m in months]
+
+
+@job("rebuild_category_totals", schemas.NoParams)
+def _rebuild_category_totals(db, params, progress):
+    from app.utils import category_totals
+    return {"rows": category_totals.rebuild(db)}
+
+
+@job("rebuild_ledger", schemas.NoParams)
+def _rebuild_ledger(db, params, progress):
+    from app.utils import ledger
+    return {"customers": ledger.rebuild(db)}
@@ -0,0 +1,59 @@
+# app/utils/ledger.py
+"""Per-customer balances kept in step with ``dues``.
+
+Every code path that opens or settles a due calls :func:`apply_due` inside the
+same transaction, so ``customer_balances`` never drifts from the dues table.
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import upsert_insert
+
+
+def apply_due(db: Session, customer_name: str, amount: float, open_delta: int) -> None:
+    """Add ``amount`` to the customer's balance (negative when settling)."""
+    cb = models.CustomerBalance
+    insert = upsert_insert(db)
+    if insert is not None:
+        stmt = insert(cb).values(customer_name=customer_name, balance=amount, open_dues=open_delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cb.customer_name],
+            set_={
+                "balance": cb.balance + stmt.excluded.balance,
+                "open_dues": cb.open_dues + stmt.excluded.open_dues,
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt)
+        return
+
+    changed = db.execute(
+        update(cb)
+        .where(cb.customer_name == customer_name)
+        .values(balance=cb.balance + amount, open_dues=cb.open_dues + open_delta)
+    ).rowcount
+    if not changed:
+        db.add(cb(customer_name=customer_name, balance=amount, open_dues=open_delta))
+
+
+def rebuild(db: Session) -> int:
+    """Recompute every balance from the unsettled dues. Returns the number of customers."""
+    d = models.Due
+    db.query(models.CustomerBalance).delete()
+    rows = db.execute(
+        select(d.customer_name, func.sum(d.amount - d.paid), func.count())
+        .where(d.is_settled == False)  # noqa: E712
+        .group_by(d.customer_name)
+    ).all()
+    db.add_all(
+        models.CustomerBalance(customer_name=name, balance=float(total), open_dues=n) for name, total, n in rows
+    )
+    db.commit()
+    return len(rows)
+
+
+def ensure_built(db: Session) -> None:
+    # first start after the ledger was introduced: seed it from existing dues
+    if db.query(models.CustomerBalance).first() is None and db.query(models.Due).first() is not None:
+        rebuild(db)
@@ -0,0 +1,111 @@
+# app/utils/readiness.py
+"""Readiness probe for load balancers (``GET /ready``).
+
+Unlike ``/health`` it touches the database. It measures a round trip that
+needs a read lock on ``products``, reports connection-pool usage and the
+depth of the anyio threadpool that sync endpoints run on, and fails (503)
+when a threshold is exceeded:
+
+* ``READY_MAX_DB_MS``          – round-trip latency; the probe gives up after 4x this
+* ``READY_MAX_POOL_USAGE``     – checked-out / (pool_size + max_overflow), for
+                                 the default engine and each open shop's
+* ``READY_MAX_THREAD_WAITING`` – requests queued for a worker thread
+"""
+import os
+import time
+from typing import Tuple
+
+import anyio
+import anyio.to_thread
+from sqlalchemy import text
+
+from app.db import engine
+from app.utils import group_commit, tenancy
+
+READY_MAX_DB_MS = float(os.getenv("READY_MAX_DB_MS", "250"))
+READY_MAX_POOL_USAGE = float(os.getenv("READY_MAX_POOL_USAGE", "0.9"))
+READY_MAX_THREAD_WAITING = int(os.getenv("READY_MAX_THREAD_WAITING", "20"))
+
+# the probe gets its own thread budget so it is not queued behind the requests it is measuring
+_probe_limiter = None
+
+
+def _db_round_trip() -> float:
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1 FROM products LIMIT 1")).first()
+    return (time.perf_counter() - t0) * 1000
+
+
+def pool_stats(bind=engine) -> dict:
+    pool = bind.pool
+    if not hasattr(pool, "checkedout"):
+        return {"kind": type(pool).__name__}
+    size = pool.size()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    out = {
+        "kind": type(pool).__name__,
+        "size": size,
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": max_overflow,
+    }
+    capacity = size + max_overflow if max_overflow >= 0 else None     # -1: unbounded overflow
+    out["usage"] = round(out["checked_out"] / capacity, 3) if capacity else 0.0
+    return out
+
+
+def threadpool_stats() -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    return {
+        "total": int(limiter.total_tokens),
+        "busy": stats.borrowed_tokens,
+        "waiting": stats.tasks_waiting,
+    }
+
+
+async def probe() -> Tuple[bool, dict]:
+    global _probe_limiter
+    if _probe_limiter is None:
+        _probe_limiter = anyio.CapacityLimiter(1)
+    failures = []
+    db = {"max_ms": READY_MAX_DB_MS}
+    with anyio.move_on_after(READY_MAX_DB_MS * 4 / 1000) as scope:
+        try:
+            db["latency_ms"] = round(await anyio.to_thread.run_sync(
+                _db_round_trip, abandon_on_cancel=True, limiter=_probe_limiter), 2)
+        except Exception as e:
+            db["error"] = f"{type(e).__name__}: {e}".splitlines()[0]
+            failures.append("db_error")
+    if scope.cancelled_caught:
+        db["error"] = "timed out"
+        failures.append("db_timeout")
+    elif db.get("latency_ms", 0) > READY_MAX_DB_MS:
+        failures.append("db_latency")
+
+    pool = pool_stats()
+    pool["max_usage"] = READY_MAX_POOL_USAGE
+    if pool.get("usage", 0) > READY_MAX_POOL_USAGE:
+        failures.append("pool_saturated")
+
+    threads = threadpool_stats()
+    threads["max_waiting"] = READY_MAX_THREAD_WAITING
+    if threads["waiting"] > READY_MAX_THREAD_WAITING:
+        failures.append("threadpool_backlog")
+
+    extra = {}
+    if tenancy.TENANCY:
+        # the default engine sits idle in this mode; saturation shows up per shop
+        tenants = tenancy.engines.stats()
+        tenants["pool_usage"] = {t.name: pool_stats(t.engine).get("usage", 0.0) for t in tenancy.engines.open()}
+        saturated = sorted(name for name, usage in tenants["pool_usage"].items() if usage > READY_MAX_POOL_USAGE)
+        if saturated:
+            tenants["saturated"] = saturated
+            failures.append("tenant_pool_saturated")
+        extra["tenants"] = tenants
+    elif group_commit.GROUP_COMMIT:
+        extra["group_commit"] = group_commit.current().stats()
+
+    body = {"ready": not failures, "failures": failures, "db": db, "pool": pool, "threadpool": threads, **extra}
+    return not failures, body
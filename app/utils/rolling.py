@@ -0,0 +1,142 @@
+# app/utils/rolling.py
+"""Hourly revenue for the last eight days, per product, kept in memory.
+
+Slots are a ring of ``HOURS`` float arrays indexed by epoch hour; a slot is
+zeroed when the ring wraps onto a new hour. Today/this-week totals and the
+hourly series become a sum over at most 192 slots.
+
+Enable with ``ROLLING_WINDOW=1``; seeded from the database at startup and
+fed by sale events afterwards.
+"""
+import os
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import current_tenant
+from app.utils import sale_events
+
+ROLLING_WINDOW = os.getenv("ROLLING_WINDOW", "0") == "1"
+HOURS = 24 * 8           # covers "this week" (Mon..today) plus a spare day
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _hour(ts: datetime) -> int:
+    return int((ts - _EPOCH).total_seconds() // 3600)
+
+
+class RollingSales(sale_events.SeededSubscriber):
+    def __init__(self, hours: int = HOURS, tenant: Optional[str] = None):
+        super().__init__(tenant)
+        self.hours = hours
+        self.slot_hour = array("q", [-1] * hours)      # epoch hour each slot currently holds
+        self.totals = array("d", [0.0] * hours)
+        self.by_product: Dict[int, array] = {}
+        self.names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, hour: int) -> int:
+        i = hour % self.hours
+        if self.slot_hour[i] != hour:
+            self.slot_hour[i] = hour
+            self.totals[i] = 0.0
+            for arr in self.by_product.values():
+                arr[i] = 0.0
+        return i
+
+    def add(self, product_id: int, revenue: float, ts: datetime, name: Optional[str] = None) -> None:
+        hour = _hour(ts)
+        with self._lock:
+            if hour <= self._newest() - self.hours:
+                return                                  # older than the window
+            i = self._slot(hour)
+            self.totals[i] += revenue
+            arr = self.by_product.get(product_id)
+            if arr is None:
+                arr = self.by_product[product_id] = array("d", [0.0] * self.hours)
+            arr[i] += revenue
+            if name:
+                self.names[product_id] = name
+
+    def _newest(self) -> int:
+        return max(self.slot_hour)
+
+    def covers(self, start: datetime) -> bool:
+        return _hour(start) > _hour(datetime.now()) - self.hours
+
+    def _live(self, start: datetime, end: datetime):
+        h0, h1 = _hour(start), _hour(end)
+        return [i for i, h in enumerate(self.slot_hour) if h0 <= h <= h1]
+
+    def total(self, start: datetime, end: datetime) -> float:
+        with self._lock:
+            return sum(self.totals[i] for i in self._live(start, end))
+
+    def top_product(self, start: datetime, end: datetime) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            slots = self._live(start, end)
+            best = max(
+                ((pid, sum(arr[i] for i in slots)) for pid, arr in self.by_product.items()),
+                key=lambda kv: kv[1], default=None,
+            )
+        return best if best and best[1] > 0 else None
+
+    def hourly(self, start: datetime, hours: int) -> List[Tuple[datetime, float]]:
+        h0 = _hour(start)
+        with self._lock:
+            by_hour = {h: self.totals[i] for i, h in enumerate(self.slot_hour) if h0 <= h < h0 + hours}
+        return [(_EPOCH + timedelta(hours=h), by_hour.get(h, 0.0)) for h in range(h0, h0 + hours)]
+
+    # ----- feeding
+    def load(self, db: Session, since: datetime, max_id: Optional[int] = None) -> None:
+        s, p = models.Sale, models.Product
+        q = (
+            select(s.id, s.product_id, p.name, s.qty * s.unit_price, s.created_at)
+            .join(p, p.id == s.product_id)
+            .where(s.created_at >= since)
+        )
+        if max_id is not None:
+            q = q.where(s.id <= max_id)
+        for _, pid, name, revenue, ts in db.execute(q).yield_per(10_000):
+            self.add(pid, float(revenue), ts, name)
+
+    def load_seed(self, db: Session, max_id: int) -> None:
+        self.load(db, datetime.now() - timedelta(hours=self.hours), max_id)
+
+    def apply(self, event: dict) -> None:
+        self.add(event["product_id"], event["revenue"], datetime.fromisoformat(event["created_at"]),
+                 event.get("product_name"))
+
+
+window: Optional[RollingSales] = None
+
+
+def start(db: Session) -> None:
+    global window
+    w = RollingSales()
+    w.start(db)
+    window = w
+
+
+def ready() -> bool:
+    return window is not None
+
+
+def _start_for(tenant) -> RollingSales:
+    w = RollingSales(tenant=tenant.name)
+    with tenant.session() as db:
+        w.start(db)
+    return w
+
+
+def current() -> Optional[RollingSales]:
+    """The window for the shop being served (seeded on its first use), or the default one."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return window
+    return tenant.state("rolling", _start_for) if ROLLING_WINDOW else None
@@ -0,0 +1,86 @@
+# app/utils/sale_events.py
+"""Committed sales broadcast over the shared cache's pub/sub.
+
+In-memory aggregates subscribe here instead of being called from the
+routers, so with a shared CACHE_URL every worker sees every sale.
+"""
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import current_tenant
+from app.utils.cache import get_cache
+
+CHANNEL = "sales"
+
+
+def publish(sale, product_name: str) -> None:
+    tenant = current_tenant.get()
+    get_cache().publish(CHANNEL, {
+        "tenant": tenant.name if tenant is not None else None,
+        "id": int(sale.id),
+        "product_id": int(sale.product_id),
+        "product_name": product_name,
+        "qty": int(sale.qty),
+        "revenue": float(sale.qty * sale.unit_price),
+        "created_at": sale.created_at.isoformat(),
+    })
+
+
+def subscribe(callback: Callable[[dict], None]) -> None:
+    get_cache().subscribe(CHANNEL, callback)
+
+
+def unsubscribe(callback: Callable[[dict], None]) -> None:
+    get_cache().unsubscribe(CHANNEL, callback)
+
+
+class SeededSubscriber(ABC):
+    """In-memory aggregate fed by sale events and seeded from the database.
+
+    Events arriving while the seed query runs are buffered and replayed
+    afterwards, skipping the ones the seed already counted. Only events of
+    ``tenant`` (the shop whose database seeded it, None by default) apply.
+    """
+
+    def __init__(self, tenant: Optional[str] = None):
+        self.tenant = tenant
+        self._pending: Optional[List[dict]] = None
+        self._pending_lock = threading.Lock()
+
+    @abstractmethod
+    def load_seed(self, db: Session, max_id: int) -> None: ...
+
+    @abstractmethod
+    def apply(self, event: dict) -> None: ...
+
+    def on_sale(self, event: dict) -> None:
+        if event.get("tenant") != self.tenant:
+            return
+        with self._pending_lock:
+            if self._pending is not None:
+                self._pending.append(event)
+                return
+        self.apply(event)
+
+    def seed(self, db: Session) -> None:
+        with self._pending_lock:
+            self._pending = []
+        max_id = db.query(func.max(models.Sale.id)).scalar() or 0
+        self.load_seed(db, max_id)
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        for event in pending:
+            if event["id"] > max_id:
+                self.apply(event)
+
+    def start(self, db: Session) -> None:
+        subscribe(self.on_sale)
+        self.seed(db)
+
+    def stop(self) -> None:
+        unsubscribe(self.on_sale)
@@ -0,0 +1,118 @@
+# app/utils/search.py
+"""Indexed product search over name, SKU and category.
+
+SQLite: an external-content FTS5 table kept in sync by triggers, so every
+write path (ORM, bulk UPDATE, raw SQL) updates the index. Postgres: a
+pg_trgm GIN index on the concatenated fields. Without either, falls back to
+a LIKE scan.
+"""
+import re
+from typing import Dict, List
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import models
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+    " name, sku, category, content='products', content_rowid='id', tokenize='unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN"
+    " INSERT INTO products_fts(rowid, name, sku, category) VALUES (new.id, new.name, new.sku, new.category); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN"
+    " INSERT INTO products_fts(products_fts, rowid, name, sku, category)"
+    " VALUES ('delete', old.id, old.name, old.sku, old.category); END",
+    "CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, sku, category ON products BEGIN"
+    " INSERT INTO products_fts(products_fts, rowid, name, sku, category)"
+    " VALUES ('delete', old.id, old.name, old.sku, old.category);"
+    " INSERT INTO products_fts(rowid, name, sku, category) VALUES (new.id, new.name, new.sku, new.category); END",
+]
+_PG_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_trgm ON products"
+    " USING gin ((name || ' ' || sku || ' ' || category) gin_trgm_ops)",
+]
+
+_fts_ready: Dict[str, bool] = {}     # per database URL (one per shop with TENANCY=1)
+
+
+def _has_fts(db: Session) -> bool:
+    # checked once per URL on first use: workers started by app.serve skip schema setup
+    bind = db.get_bind()
+    key = str(bind.url)
+    ready = _fts_ready.get(key)
+    if ready is None:
+        ready = _fts_ready[key] = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+        ).first() is not None
+    return ready
+
+
+def ensure_index(bind) -> None:
+    dialect = bind.dialect.name
+    try:
+        with bind.begin() as conn:
+            if dialect == "sqlite":
+                fresh = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+                ).first() is None
+                for ddl in _SQLITE_DDL:
+                    conn.exec_driver_sql(ddl)
+                if fresh:
+                    conn.exec_driver_sql("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+                _fts_ready[str(bind.url)] = True
+            elif dialect == "postgresql":
+                for ddl in _PG_DDL:
+                    conn.exec_driver_sql(ddl)
+    except DBAPIError:
+        _fts_ready[str(bind.url)] = False      # SQLite built without FTS5 / no rights for the extension: LIKE fallback
+
+
+def _match_expr(q: str) -> str:
+    # every token as a quoted prefix: "app" "gre" -> matches "Green Apple"
+    return " ".join(f'"{t}"*' for t in re.findall(r"\w+", q))
+
+
+def _like_escape(q: str) -> str:
+    # LIKE pattern matching q literally with ESCAPE '\'; backslashes first so the added escapes are not doubled
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search(db: Session, q: str, limit: int, offset: int) -> List[models.Product]:
+    p = models.Product
+    bind = db.get_bind()
+    dialect = bind.dialect.name
+    if dialect == "sqlite" and _has_fts(db):
+        expr = _match_expr(q)
+        if not expr:
+            return []
+        ids = [
+            r[0] for r in db.execute(
+                text("SELECT rowid FROM products_fts WHERE products_fts MATCH :m ORDER BY rank LIMIT :l OFFSET :o"),
+                {"m": expr, "l": limit, "o": offset},
+            )
+        ]
+        by_id = {x.id: x for x in db.query(p).filter(p.id.in_(ids)).all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+    lit = _like_escape(q)
+    if dialect == "postgresql":
+        haystack = p.name + " " + p.sku + " " + p.category
+        return (
+            db.query(p)
+            .filter(haystack.ilike(f"%{lit}%", escape="\\"))
+            .order_by(p.name.ilike(f"{lit}%", escape="\\").desc(), p.name)
+            .offset(offset).limit(limit).all()
+        )
+
+    return (
+        db.query(p)
+        .filter(or_(
+            p.name.ilike(f"%{lit}%", escape="\\"),
+            p.sku.ilike(f"{lit}%", escape="\\"),
+            p.category.ilike(f"{lit}%", escape="\\"),
+        ))
+        .order_by(p.name)
+        .offset(offset).limit(limit).all()
+    )
@@ -0,0 +1,101 @@
+# app/utils/seasonal.py
+"""Additive Holt-Winters with a weekly season and grid-searched parameters.
+
+The whole alpha/beta/gamma grid is evaluated in one pass over the series:
+every state is an array with one entry per parameter combination (and per
+product when fitting a batch), so the only Python loop is over time.
+"""
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict, List
+
+import numpy as np
+
+SEASON = 7
+ALPHAS = (0.1, 0.3, 0.5, 0.7, 0.9)
+BETAS = (0.01, 0.05, 0.1, 0.2, 0.3)
+GAMMAS = (0.05, 0.1, 0.2, 0.3, 0.5)
+
+
+@dataclass
+class HWFit:
+    level: np.ndarray     # (N,)
+    trend: np.ndarray     # (N,)
+    season: np.ndarray    # (N, m), indexed by t % m
+    n_obs: int
+    alpha: np.ndarray
+    beta: np.ndarray
+    gamma: np.ndarray
+    sse: np.ndarray
+
+    def forecast(self, horizon: int) -> np.ndarray:
+        """(N, horizon) point forecasts, clipped at zero demand."""
+        m = self.season.shape[1]
+        h = np.arange(1, horizon + 1)
+        idx = (self.n_obs + h - 1) % m
+        yhat = self.level[:, None] + h[None, :] * self.trend[:, None] + self.season[:, idx]
+        return np.clip(yhat, 0.0, None)
+
+    def params(self, i: int = 0) -> Dict[str, float]:
+        return {"alpha": float(self.alpha[i]), "beta": float(self.beta[i]), "gamma": float(self.gamma[i])}
+
+
+def _grid():
+    a, b, g = (np.array(v, dtype=float) for v in zip(*product(ALPHAS, BETAS, GAMMAS)))
+    return a, b, g
+
+
+def fit_batch(Y: np.ndarray, m: int = SEASON) -> HWFit:
+    """Fit every row of ``Y`` (N products x T days, T >= 2m) over the full grid."""
+    Y = np.asarray(Y, dtype=float)
+    n, T = Y.shape
+    A, B, G = _grid()                                   # (K,)
+    K = A.size
+
+    # classic initialisation from the first two seasons
+    first, second = Y[:, :m].mean(axis=1), Y[:, m:2 * m].mean(axis=1)
+    L = np.repeat(first[:, None], K, axis=1)            # (N, K)
+    Tr = np.repeat(((second - first) / m)[:, None], K, axis=1)
+    S = np.repeat((Y[:, :m] - first[:, None])[:, None, :], K, axis=1)  # (N, K, m)
+    sse = np.zeros((n, K))
+
+    for t in range(T):
+        y = Y[:, t:t + 1]                               # (N, 1)
+        s = S[:, :, t % m]
+        err = y - (L + Tr + s)
+        if t >= m:                                      # first season only seeds the state
+            sse += err * err
+        L_new = A * (y - s) + (1 - A) * (L + Tr)
+        Tr = B * (L_new - L) + (1 - B) * Tr
+        S[:, :, t % m] = G * (y - L_new) + (1 - G) * s
+        L = L_new
+
+    best = sse.argmin(axis=1)
+    rows = np.arange(n)
+    return HWFit(
+        level=L[rows, best], trend=Tr[rows, best], season=S[rows, best], n_obs=T,
+        alpha=A[best], beta=B[best], gamma=G[best], sse=sse[rows, best],
+    )
+
+
+def holt_winters(series: List[float], horizon: int, m: int = SEASON):
+    """Forecast one daily series; returns (forecast, fitted params)."""
+    fit = fit_batch(np.asarray(series, dtype=float)[None, :], m)
+    return fit.forecast(horizon)[0].tolist(), fit.params()
+
+
+def state_path(series: List[float], alpha: float, beta: float, gamma: float, m: int = SEASON):
+    """Level, trend and season after each observation: (T,), (T,), (T, m)."""
+    y = np.asarray(series, dtype=float)
+    T = y.size
+    level, trend = y[:m].mean(), (y[m:2 * m].mean() - y[:m].mean()) / m
+    season = y[:m] - level
+    Ls, Ts, Ss = np.empty(T), np.empty(T), np.empty((T, m))
+    for t in range(T):
+        s = season[t % m]
+        new_level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        season[t % m] = gamma * (y[t] - new_level) + (1 - gamma) * s
+        level = new_level
+        Ls[t], Ts[t], Ss[t] = level, trend, season
+    return Ls, Ts, Ss
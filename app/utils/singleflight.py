@@ -0,0 +1,83 @@
+# app/utils/singleflight.py
+"""Coalesce identical concurrent calls into one execution.
+
+Report endpoints are sync and run in the threadpool; when a dashboard burst
+asks for the same report at once, the first caller computes it and the
+others wait for (and share) that result instead of re-running the SQL.
+"""
+import threading
+from collections import defaultdict
+from functools import wraps
+from typing import Any, Callable, Dict, Hashable
+
+from app.db import current_tenant
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "executed": 0, "coalesced": 0})
+
+    def do(self, key: Hashable, fn: Callable[[], Any], name: str = "default") -> Any:
+        with self._lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                stats["executed"] += 1
+            else:
+                stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(s) for name, s in self._stats.items()}
+
+
+group = SingleFlight()
+
+
+def coalesced(fn):
+    """Share one execution of an endpoint among concurrent calls with equal arguments.
+
+    The ``db`` session is left out of the key: followers use the leader's result.
+    Calls for different shops (TENANCY=1) never share a result.
+    """
+    name = fn.__name__
+
+    @wraps(fn)
+    def wrapper(**kwargs):
+        tenant = current_tenant.get()
+        key = (tenant.name if tenant is not None else None, name,
+               tuple(sorted((k, v) for k, v in kwargs.items() if k != "db")))
+        return group.do(key, lambda: fn(**kwargs), name)
+
+    return wrapper
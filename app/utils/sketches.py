@@ -0,0 +1,166 @@
+# app/utils/sketches.py
+"""Approximate top-N revenue products (weighted Space-Saving).
+
+A sketch tracks at most ``k`` products. When a new product arrives and the
+sketch is full, it replaces the smallest entry and inherits its count as
+``error``. For every reported product, ``count - error <= true <= count``,
+and every product whose revenue exceeds ``total / k`` is always reported.
+
+There is one all-time sketch plus one per day for the last ``DAYS`` days,
+and windowed queries merge the daily sketches. Enable with HEAVY_HITTERS=1.
+"""
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.db import current_tenant
+from app.utils import sale_events
+
+HEAVY_HITTERS = os.getenv("HEAVY_HITTERS", "0") == "1"
+HEAVY_HITTERS_K = int(os.getenv("HEAVY_HITTERS_K", "256"))
+DAYS = 31
+
+
+class SpaceSaving:
+    def __init__(self, k: int = HEAVY_HITTERS_K):
+        self.k = k
+        self.counts: Dict[int, List[float]] = {}     # key -> [count, error]
+        self.total = 0.0
+
+    def add(self, key: int, weight: float) -> None:
+        self.total += weight
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += weight
+        elif len(self.counts) < self.k:
+            self.counts[key] = [weight, 0.0]
+        else:
+            victim = min(self.counts, key=lambda x: self.counts[x][0])
+            floor = self.counts.pop(victim)[0]
+            self.counts[key] = [floor + weight, floor]
+
+    @classmethod
+    def from_exact(cls, totals, k: int = HEAVY_HITTERS_K) -> "SpaceSaving":
+        """Seed from exact per-key totals: the k largest are kept error-free, which
+        satisfies the invariant that every untracked key is at most the minimum."""
+        out = cls(k)
+        items = sorted(totals, key=lambda kv: -kv[1])
+        out.total = sum(v for _, v in items)
+        out.counts = {key: [v, 0.0] for key, v in items[:k]}
+        return out
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        out = SpaceSaving(self.k)
+        out.total = self.total + other.total
+        merged: Dict[int, List[float]] = {}
+        for src in (self, other):
+            for key, (c, e) in src.counts.items():
+                m = merged.setdefault(key, [0.0, 0.0])
+                m[0] += c
+                m[1] += e
+        # a key missing from a full sketch may still hold up to that sketch's minimum
+        for src in (self, other):
+            if len(src.counts) >= src.k:
+                floor = min(c for c, _ in src.counts.values())
+                for key, m in merged.items():
+                    if key not in src.counts:
+                        m[0] += floor
+                        m[1] += floor
+        out.counts = dict(sorted(merged.items(), key=lambda kv: -kv[1][0])[: self.k])
+        return out
+
+    def top(self, n: int) -> List[Tuple[int, float, float]]:
+        """[(key, estimated count, max overestimate)], largest first."""
+        items = sorted(self.counts.items(), key=lambda kv: -kv[1][0])[:n]
+        return [(key, c, e) for key, (c, e) in items]
+
+
+class HeavyHitters(sale_events.SeededSubscriber):
+    def __init__(self, k: int = HEAVY_HITTERS_K, tenant: Optional[str] = None):
+        super().__init__(tenant)
+        self.k = k
+        self.all_time = SpaceSaving(k)
+        self.daily: Dict[date, SpaceSaving] = {}
+        self._lock = threading.Lock()
+
+    def add(self, product_id: int, revenue: float, day: date) -> None:
+        with self._lock:
+            self.all_time.add(product_id, revenue)
+            if day > date.today() - timedelta(days=DAYS):
+                sketch = self.daily.get(day)
+                if sketch is None:
+                    sketch = self.daily[day] = SpaceSaving(self.k)
+                    cutoff = date.today() - timedelta(days=DAYS)
+                    for old in [d for d in self.daily if d <= cutoff]:
+                        del self.daily[old]
+                sketch.add(product_id, revenue)
+
+    def top(self, n: int, days: Optional[int] = None) -> List[Tuple[int, float, float]]:
+        with self._lock:
+            if days is None:
+                return self.all_time.top(n)
+            since = date.today() - timedelta(days=days)
+            merged = SpaceSaving(self.k)
+            for day, sketch in self.daily.items():
+                if day >= since:
+                    merged = merged.merge(sketch)
+        return merged.top(n)
+
+    def load_seed(self, db: Session, max_id: int) -> None:
+        s = models.Sale
+        revenue = func.sum(s.qty * s.unit_price)
+        q = select(s.product_id, revenue).where(s.id <= max_id).group_by(s.product_id)
+        totals: Dict[int, float] = {pid: float(v or 0.0) for pid, v in db.execute(q)}
+        for pid, v in db.execute(select(models.SaleDaily.product_id, func.sum(models.SaleDaily.revenue))
+                                 .group_by(models.SaleDaily.product_id)):
+            totals[pid] = totals.get(pid, 0.0) + float(v or 0.0)     # archived months
+        all_time = SpaceSaving.from_exact(totals.items(), self.k)
+
+        day = func.date(s.created_at)
+        since = datetime.combine(date.today() - timedelta(days=DAYS - 1), datetime.min.time())
+        q = select(day, s.product_id, revenue).where(s.id <= max_id, s.created_at >= since).group_by(day, s.product_id)
+        per_day: Dict[date, list] = {}
+        for d, pid, v in db.execute(q):
+            d = d if isinstance(d, date) else date.fromisoformat(str(d))
+            per_day.setdefault(d, []).append((pid, float(v or 0.0)))
+        daily = {d: SpaceSaving.from_exact(items, self.k) for d, items in per_day.items()}
+
+        with self._lock:
+            # events applied before the seed finished only ever touch ids > max_id
+            for pid, (c, e) in all_time.counts.items():
+                self.all_time.counts[pid] = [c, e]
+            self.all_time.total += all_time.total
+            self.daily.update(daily)
+
+    def apply(self, event: dict) -> None:
+        self.add(event["product_id"], event["revenue"], datetime.fromisoformat(event["created_at"]).date())
+
+
+tracker: Optional[HeavyHitters] = None
+
+
+def start(db: Session) -> None:
+    global tracker
+    t = HeavyHitters()
+    t.start(db)
+    tracker = t
+
+
+def _start_for(tenant) -> HeavyHitters:
+    t = HeavyHitters(tenant=tenant.name)
+    with tenant.session() as db:
+        t.start(db)
+    return t
+
+
+def current() -> Optional[HeavyHitters]:
+    """The sketch for the shop being served (seeded on its first use), or the default one."""
+    tenant = current_tenant.get()
+    if tenant is None:
+        return tracker
+    return tenant.state("sketches", _start_for) if HEAVY_HITTERS else None
@@ -0,0 +1,39 @@
+# app/utils/sparse.py
+"""``?fields=`` column selection and the compact list format.
+
+``columns`` maps the requested field names onto SQL expressions, so only
+those columns are selected (and joins are skipped when their columns are
+not requested). ``respond`` then serializes the rows directly, either as
+objects or compactly as ``{"fields": [...], "rows": [[...], ...]}``. This
+skips building and validating a Pydantic model for every row.
+"""
+import json
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+
+def columns(fields: Optional[str], available: Dict[str, object]) -> Dict[str, object]:
+    if not fields:
+        return dict(available)
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [n for n in names if n not in available]
+    if unknown or not names:
+        raise HTTPException(422, f"Unknown fields {unknown}; choose from {list(available)}")
+    return {n: available[n] for n in dict.fromkeys(names)}
+
+
+def _default(v):
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def respond(names: List[str], rows: Iterable, shape: str) -> Response:
+    if shape == "compact":
+        body = {"fields": names, "rows": [list(r) for r in rows]}
+    else:
+        body = [dict(zip(names, r)) for r in rows]
+    return Response(json.dumps(body, default=_default, separators=(",", ":")), media_type="application/json")
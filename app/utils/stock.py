@@ -0,0 +1,133 @@
+# app/utils/stock.py
+"""Stock movement ledger and point-in-time inventory.
+
+Every change to ``Product.stock`` is also written to ``stock_movements``
+(same transaction). ``take_snapshot`` stores the stock of all products
+compactly (product ids delta-encoded, zlib-compressed). ``stock_at(T)`` then
+starts from the newest snapshot taken at or before T and applies only the
+movements after it. Without such a snapshot it starts from the current
+stock and subtracts the movements after T.
+
+On Postgres, movement ids are assigned at insert, not commit, so a movement
+below ``MAX(id)`` may still be uncommitted when a snapshot is taken. Such a
+snapshot stores the stock as of the newest movement older than
+``SNAPSHOT_LAG_SECONDS``: the newer movements are subtracted again and
+replayed by ``stock_at`` like any later one. Set the lag above the longest
+transaction that changes stock. SQLite commits in id order and needs no lag.
+"""
+import os
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app import models
+
+KINDS = ("initial", "sale", "adjustment", "restock")
+SNAPSHOT_LAG_SECONDS = float(os.getenv("SNAPSHOT_LAG_SECONDS", "300"))
+
+# stock as of the newest movement older than the lag (measured back from the newest movement)
+_SNAPSHOT_WITH_LAG = text("""
+WITH mark AS (
+    SELECT COALESCE(MAX(id), 0) AS id FROM stock_movements
+    WHERE created_at < (SELECT MAX(created_at) FROM stock_movements) - make_interval(secs => :lag)
+), recent AS (
+    SELECT m.product_id, SUM(m.delta) AS delta FROM stock_movements m, mark
+    WHERE m.id > mark.id GROUP BY m.product_id
+)
+SELECT p.id, p.stock - COALESCE(r.delta, 0), mark.id
+FROM products p CROSS JOIN mark LEFT JOIN recent r ON r.product_id = p.id
+""")
+
+
+def record(db: Session, product_id: int, delta: int, kind: str,
+           ref_id: Optional[int] = None, note: Optional[str] = None) -> None:
+    if delta:
+        db.add(models.StockMovement(product_id=product_id, delta=delta, kind=kind, ref_id=ref_id, note=note))
+
+
+def record_many(db: Session, rows: Iterable[dict]) -> None:
+    """Bulk insert of ``{"product_id", "delta", "kind"[, "note"]}`` rows."""
+    rows = [{"ref_id": None, "note": None, **r} for r in rows if r["delta"]]
+    if rows:
+        db.execute(insert(models.StockMovement.__table__), rows)
+
+
+def pack(stock: Dict[int, int]) -> bytes:
+    out = array("q")
+    prev = 0
+    for pid in sorted(stock):
+        out.append(pid - prev)
+        out.append(stock[pid])
+        prev = pid
+    return zlib.compress(out.tobytes(), 6)
+
+
+def unpack(data: bytes) -> Dict[int, int]:
+    flat = array("q")
+    flat.frombytes(zlib.decompress(data))
+    stock, pid = {}, 0
+    for i in range(0, len(flat), 2):
+        pid += flat[i]
+        stock[pid] = flat[i + 1]
+    return stock
+
+
+def take_snapshot(db: Session, lag_seconds: float = SNAPSHOT_LAG_SECONDS) -> models.StockSnapshot:
+    # one statement, so stock and the movement high-water mark come from the same view
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_SNAPSHOT_WITH_LAG, {"lag": lag_seconds}).all()
+    else:
+        rows = db.execute(text(
+            "SELECT id, stock, (SELECT COALESCE(MAX(id), 0) FROM stock_movements) FROM products"
+        )).all()
+    last = rows[0][2] if rows else db.query(func.coalesce(func.max(models.StockMovement.id), 0)).scalar()
+    snap = models.StockSnapshot(
+        last_movement_id=last, products=len(rows), data=pack({pid: st for pid, st, _ in rows})
+    )
+    db.add(snap)
+    db.commit()
+    db.refresh(snap)
+    return snap
+
+
+def _sums(db: Session, *where) -> Dict[int, int]:
+    m = models.StockMovement
+    q = select(m.product_id, func.sum(m.delta)).where(*where).group_by(m.product_id)
+    return {pid: int(d) for pid, d in db.execute(q)}
+
+
+def stock_at(db: Session, at: datetime) -> Tuple[Dict[int, int], Optional[models.StockSnapshot], int]:
+    """(stock per product at ``at``, snapshot used or None, movements applied)."""
+    m = models.StockMovement
+    snap = (
+        db.query(models.StockSnapshot)
+        .filter(models.StockSnapshot.taken_at <= at)
+        .order_by(models.StockSnapshot.taken_at.desc(), models.StockSnapshot.id.desc())
+        .first()
+    )
+    if snap is not None:
+        stock = unpack(snap.data)
+        after = (m.id > snap.last_movement_id, m.created_at <= at)
+        sums = _sums(db, *after)
+        for pid, d in sums.items():
+            stock[pid] = stock.get(pid, 0) + d
+        applied = db.query(func.count(m.id)).filter(*after).scalar()
+        return stock, snap, applied
+
+    # no snapshot that old: walk back from the live stock
+    stock = dict(db.execute(select(models.Product.id, models.Product.stock)).all())
+    sums = _sums(db, m.created_at > at)
+    for pid, d in sums.items():
+        if pid in stock:
+            stock[pid] -= d
+    born_later = db.execute(
+        select(m.product_id).where(m.kind == "initial", m.created_at > at).distinct()
+    ).scalars()
+    for pid in born_later:
+        stock.pop(pid, None)
+    applied = db.query(func.count(m.id)).filter(m.created_at > at).scalar()
+    return stock, None, applied
@@ -0,0 +1,246 @@
+# app/utils/tenancy.py
+"""One process serving many shops, each with its own database.
+
+With ``TENANCY=1`` every ``/api/`` request names its shop, either in the
+``X-Tenant`` header or as the first label of the Host under
+``TENANT_DOMAIN`` (``shop1.growai.app``). The shop's database URL is
+``TENANT_DATABASE_URL`` with ``{tenant}`` substituted. Its engine comes
+from a bounded LRU (``TENANT_MAX_ENGINES``) and is schema-initialized on
+first use.
+
+Requests only reach shops that already exist: a name in ``TENANTS``
+(comma-separated) when it is set, otherwise one whose SQLite file is
+already there. Anything else is a 404, so a made-up header cannot create
+databases. New shops are provisioned from the command line
+(``python -m app.cli --tenant <shop> init-db``). Server databases need
+``TENANTS``.
+
+Each engine has its own small pool (``TENANT_POOL_SIZE``), so a busy shop
+cannot use up another shop's connections. An engine that is in use by a
+request or a background job is never evicted. The LRU may grow past its
+bound until one is released.
+
+Per-shop in-memory state (rolling window, top-products sketch, demand
+statistics, DuckDB copy, group committer) hangs off the ``Tenant`` and is
+dropped with it. Opening a shop's engine runs the same stale-job sweep as
+startup does for the default database.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import anyio.to_thread
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import sessionmaker
+
+from app.db import current_tenant, make_engine
+
+TENANCY = os.getenv("TENANCY", "0") == "1"
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL", "sqlite:///./tenants/{tenant}.db")
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant").lower().encode()
+TENANT_DOMAIN = os.getenv("TENANT_DOMAIN", "").lower()
+TENANT_MAX_ENGINES = int(os.getenv("TENANT_MAX_ENGINES", "32"))
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "2"))
+TENANT_MAX_OVERFLOW = int(os.getenv("TENANT_MAX_OVERFLOW", "3"))
+TENANTS = frozenset(n.strip().lower() for n in os.getenv("TENANTS", "").split(",") if n.strip())
+
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+class UnknownTenant(Exception):
+    pass
+
+
+def _sqlite_path(url: str) -> Optional[str]:
+    return url[len("sqlite:///"):] if url.startswith("sqlite:///") else None
+
+
+def known(name: str) -> bool:
+    """A configured shop, or (without ``TENANTS``) one whose SQLite database already exists."""
+    if TENANTS:
+        return name in TENANTS
+    path = _sqlite_path(TENANT_DATABASE_URL.format(tenant=name))
+    return path is not None and os.path.exists(path)
+
+
+class Tenant:
+    def __init__(self, name: str, pool: "TenantEngines"):
+        self.name = name
+        self.url = TENANT_DATABASE_URL.format(tenant=name)
+        path = _sqlite_path(self.url)
+        if path is not None:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+        self.engine = make_engine(self.url, TENANT_POOL_SIZE, TENANT_MAX_OVERFLOW)
+        self.session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False, future=True)
+        self.users = 0
+        self._pool = pool
+        self._state: Dict[str, Any] = {}
+        self._state_lock = threading.Lock()
+
+    def state(self, key: str, factory: Callable[["Tenant"], Any]) -> Any:
+        """Per-shop singleton, built on first use (e.g. an in-memory aggregate seeded from this DB)."""
+        value = self._state.get(key)
+        if value is None:
+            with self._state_lock:
+                value = self._state.get(key)
+                if value is None:
+                    value = self._state[key] = factory(self)
+        return value
+
+    def retain(self) -> "Tenant":
+        self._pool.retain(self)
+        return self
+
+    def release(self) -> None:
+        self._pool.release(self)
+
+    def close(self) -> None:
+        for value in self._state.values():
+            for method in ("stop", "close"):
+                if hasattr(value, method):
+                    getattr(value, method)()
+                    break
+        self.engine.dispose()
+
+
+class TenantEngines:
+    """LRU of per-shop engines; only idle ones (no request or job holding them) are evicted."""
+
+    def __init__(self, max_engines: int = TENANT_MAX_ENGINES):
+        self.max_engines = max_engines
+        self._entries: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._creating: Dict[str, threading.Lock] = {}
+        self.opened = self.evicted = 0
+
+    def acquire(self, name: str, create: bool = False) -> Tenant:
+        """The shop's tenant, opened if needed; ``UnknownTenant`` unless it exists or ``create``."""
+        with self._lock:
+            t = self._entries.get(name)
+            if t is not None:
+                self._entries.move_to_end(name)
+                t.users += 1
+                return t
+        if not create and not known(name):
+            raise UnknownTenant(name)
+        with self._lock:
+            creating = self._creating.setdefault(name, threading.Lock())
+        with creating:      # schema setup for one new shop doesn't block requests for the others
+            with self._lock:
+                t = self._entries.get(name)
+                if t is not None:
+                    self._entries.move_to_end(name)
+                    t.users += 1
+                    return t
+            t = Tenant(name, self)
+            from app.bootstrap import init_db
+            try:
+                init_db(t.engine)      # includes the stale-job sweep, safe while other workers run jobs
+            except BaseException:
+                t.engine.dispose()
+                with self._lock:
+                    self._creating.pop(name, None)
+                raise
+            with self._lock:
+                self._entries[name] = t
+                self._creating.pop(name, None)
+                t.users += 1
+                self.opened += 1
+                victims = self._evictable()
+        for v in victims:
+            v.close()
+        return t
+
+    def retain(self, t: Tenant) -> None:
+        with self._lock:
+            t.users += 1
+
+    def release(self, t: Tenant) -> None:
+        with self._lock:
+            t.users -= 1
+            victims = self._evictable()
+        for v in victims:
+            v.close()
+
+    def _evictable(self) -> list:
+        victims = []
+        excess = len(self._entries) - self.max_engines
+        for name, t in list(self._entries.items()):
+            if excess <= 0:
+                break
+            if t.users == 0:
+                del self._entries[name]
+                victims.append(t)
+                excess -= 1
+        self.evicted += len(victims)
+        return victims
+
+    def open(self) -> list:
+        with self._lock:
+            return list(self._entries.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": len(self._entries),
+                "max": self.max_engines,
+                "in_use": sum(1 for t in self._entries.values() if t.users),
+                "opened": self.opened,
+                "evicted": self.evicted,
+            }
+
+    def close_all(self) -> None:
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), OrderedDict()
+        for t in entries:
+            t.close()
+
+
+engines = TenantEngines()
+
+
+def current() -> Optional[Tenant]:
+    return current_tenant.get()
+
+
+def current_name() -> Optional[str]:
+    t = current_tenant.get()
+    return t.name if t is not None else None
+
+
+def resolve(headers: Dict[bytes, bytes]) -> Optional[str]:
+    name = headers.get(TENANT_HEADER, b"").decode("latin-1").strip().lower()
+    if not name and TENANT_DOMAIN:
+        host = headers.get(b"host", b"").decode("latin-1").split(":")[0].lower()
+        if host.endswith("." + TENANT_DOMAIN):
+            name = host[: -len(TENANT_DOMAIN) - 1]
+    return name or None
+
+
+class TenantMiddleware:
+    """Binds each ``/api/`` request to its shop's engine for the duration of the request."""
+
+    def __init__(self, asgi_app):
+        self.app = asgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            return await self.app(scope, receive, send)
+        name = resolve(dict(scope["headers"]))
+        if name is None or not _NAME.match(name):
+            detail = "Missing tenant" if name is None else "Invalid tenant name"
+            return await JSONResponse({"detail": detail}, status_code=400)(scope, receive, send)
+        try:
+            tenant = await anyio.to_thread.run_sync(engines.acquire, name)
+        except UnknownTenant:
+            return await JSONResponse({"detail": "Unknown tenant"}, status_code=404)(scope, receive, send)
+        token = current_tenant.set(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+            tenant.release()
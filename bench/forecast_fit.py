@@ -0,0 +1,50 @@
+"""Time Holt-Winters grid fitting for a large catalog.
+
+    python bench/forecast_fit.py --skus 10000 --days 180
+
+Fits every SKU over the full alpha/beta/gamma grid, batched, and compares
+the per-SKU cost with fitting one series at a time.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import seasonal  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--skus", type=int, default=10_000)
+    ap.add_argument("--days", type=int, default=180)
+    ap.add_argument("--batch", type=int, default=1_000)
+    ap.add_argument("--single", type=int, default=200, help="SKUs to fit one at a time for comparison")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    base = rng.gamma(2.0, 5.0, size=(args.skus, 1))
+    weekly = 1 + 0.4 * np.sin(2 * np.pi * np.arange(args.days) / 7)
+    Y = rng.poisson(base * weekly[None, :]).astype(float)
+    grid = len(seasonal.ALPHAS) * len(seasonal.BETAS) * len(seasonal.GAMMAS)
+    print(f"{args.skus:,} SKUs x {args.days} days, {grid} parameter combinations each")
+
+    t0 = time.perf_counter()
+    for i in range(0, args.skus, args.batch):
+        seasonal.fit_batch(Y[i:i + args.batch]).forecast(14)
+    batched = time.perf_counter() - t0
+    print(f"  batched ({args.batch}/batch): {batched:.2f} s total, {batched / args.skus * 1e3:.3f} ms/SKU")
+
+    n = min(args.single, args.skus)
+    t0 = time.perf_counter()
+    for i in range(n):
+        seasonal.holt_winters(Y[i].tolist(), 14)
+    single = (time.perf_counter() - t0) / n
+    print(f"  one at a time:        {single * 1e3:.3f} ms/SKU (~{single * args.skus:.1f} s for the catalog)")
+
+
+if __name__ == "__main__":
+    main()
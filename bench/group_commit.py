@@ -0,0 +1,110 @@
+"""Sale throughput and latency with and without group commit.
+
+    python bench/group_commit.py --threads 32 --sales 50 --wait-ms 0,1,2,5,10
+
+Creates a throwaway SQLite file with a few products, then has ``--threads``
+terminals record ``--sales`` sales each through the sales router, first
+with a commit per sale and then with group commit at each ``--wait-ms``.
+Latency is measured per sale from the call until it returns, which with
+group commit is after its batch committed.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run(threads: int, per_thread: int, products: int) -> dict:
+    from app import schemas
+    from app.db import SessionLocal
+    from app.routers import sales
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start = threading.Barrier(threads + 1)
+
+    def terminal(n: int) -> None:
+        mine, failed = [], []
+        start.wait()
+        with SessionLocal() as db:
+            for i in range(per_thread):
+                payload = schemas.SaleCreate(product_id=(n * per_thread + i) % products + 1, qty=1, unit_price=9.5)
+                t0 = time.perf_counter()
+                try:
+                    sales._create_sale(payload, db)
+                except Exception as e:
+                    db.rollback()
+                    failed.append(type(e).__name__)
+                    continue
+                mine.append(time.perf_counter() - t0)
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    workers = [threading.Thread(target=terminal, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "per_s": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p99": pick(0.99),
+        "errors": len(errors),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--sales", type=int, default=50, help="sales per thread")
+    ap.add_argument("--products", type=int, default=200)
+    ap.add_argument("--wait-ms", default="0,1,2,5,10", help="group-commit windows to try")
+    ap.add_argument("--max-items", type=int, default=64)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app import models
+    from app.bootstrap import init_db
+    from app.db import SessionLocal
+    from app.utils import group_commit
+
+    init_db()
+    with SessionLocal() as db:
+        db.add_all(
+            models.Product(sku=f"SKU{i}", name=f"Product {i}", category="Bench", stock=10**9, price=9.5)
+            for i in range(1, args.products + 1)
+        )
+        db.commit()
+
+    print(f"{args.threads} threads x {args.sales} sales into {path}")
+    print(f"  {'mode':<18} {'sales/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'batch':>6} {'errors':>6}")
+    group_commit.GROUP_COMMIT = False
+    r = run(args.threads, args.sales, args.products)
+    print(f"  {'commit per sale':<18} {r['per_s']:9.0f} {r['p50']:8.1f} {r['p99']:8.1f} {1:6.1f} {r['errors']:6d}")
+
+    group_commit.GROUP_COMMIT = True
+    group_commit.GROUP_COMMIT_MAX = args.max_items
+    for wait in (float(w) for w in args.wait_ms.split(",")):
+        group_commit.GROUP_COMMIT_MS = wait
+        r = run(args.threads, args.sales, args.products)
+        batch = group_commit.current().stats()["avg_batch"]
+        group_commit.shutdown()
+        label = f"group {wait:g} ms"
+        print(f"  {label:<18} {r['per_s']:9.0f} {r['p50']:8.1f} {r['p99']:8.1f} {batch:6.1f} {r['errors']:6d}")
+
+
+if __name__ == "__main__":
+    main()
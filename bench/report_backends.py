@@ -0,0 +1,100 @@
+"""Compare the SQL and DuckDB paths for the heavy report queries.
+
+    python bench/report_backends.py --rows 2000000 --products 5000
+
+Seeds a throwaway SQLite file, then times sales-series and top-products on
+both backends (the DuckDB sync is timed separately). category-share is
+timed on SQL only: it reads the precomputed ``category_daily`` table, built
+by the schema setup after seeding, on either backend.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(path: str, rows: int, products: int) -> None:
+    con = sqlite3.connect(path)
+    con.execute(
+        "CREATE TABLE products (id INTEGER PRIMARY KEY, sku TEXT, name TEXT, category TEXT,"
+        " stock INTEGER, price REAL, reorder_point INTEGER)"
+    )
+    con.execute(
+        "CREATE TABLE sales (id INTEGER PRIMARY KEY, product_id INTEGER, qty INTEGER, unit_price REAL,"
+        " is_credit BOOLEAN, customer_name TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL)"
+    )
+    con.execute("CREATE INDEX ix_sales_product_id ON sales (product_id)")
+    cats = [f"Cat {i}" for i in range(12)]
+    con.executemany(
+        "INSERT INTO products VALUES (?, ?, ?, ?, 100, 10.0, 5)",
+        [(i, f"SKU{i}", f"Product {i}", random.choice(cats)) for i in range(1, products + 1)],
+    )
+    now = datetime.now()
+    batch = []
+    for i in range(1, rows + 1):
+        ts = now - timedelta(seconds=random.randint(0, 365 * 86400))
+        batch.append((i, random.randint(1, products), random.randint(1, 5), round(random.uniform(1, 50), 2),
+                      False, None, ts.strftime("%Y-%m-%d %H:%M:%S")))
+        if len(batch) == 100_000:
+            con.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    con.executemany("INSERT INTO sales VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+    con.commit()
+    con.close()
+
+
+def timed(label: str, fn, repeat: int) -> None:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<16} {best * 1000:9.1f} ms")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--products", type=int, default=2_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"seeding {args.rows:,} sales into {path}")
+    seed(path, args.rows, args.products)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    from app.bootstrap import init_db
+    from app.db import SessionLocal
+    from app.routers import reports
+    from app.utils import analytics
+
+    t0 = time.perf_counter()
+    init_db()
+    print(f"schema setup and precomputed totals {time.perf_counter() - t0:.1f} s")
+
+    db = SessionLocal()
+    print("sql")
+    timed("sales-series", lambda: reports.sales_series(days=120, db=db), args.repeat)
+    timed("top-products", lambda: reports.top_products(limit=20, db=db), args.repeat)
+    timed("category-share", lambda: reports.category_share(days=None, db=db), args.repeat)
+
+    duck = analytics.DuckAnalytics(sync_seconds=float("inf"))
+    t0 = time.perf_counter()
+    duck.sync(force=True)
+    print(f"duckdb (initial sync {time.perf_counter() - t0:.1f} s, attached={duck._attached})")
+    analytics._backend = duck
+    analytics.ANALYTICS_BACKEND = "duckdb"
+    timed("sales-series", lambda: reports.sales_series(days=120, db=db), args.repeat)
+    timed("top-products", lambda: reports.top_products(limit=20, db=db), args.repeat)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
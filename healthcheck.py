@@ -2,3 +2,10 @@ from fastapi import FastAPI
 app = FastAPI()
 @app.get("/health") 
 def health(): return {"ok": True}
+
+@app.get("/ready")
+async def ready():
+    from fastapi.responses import JSONResponse
+    from app.utils import readiness
+    ok, body = await readiness.probe()
+    return JSONResponse(body, status_code=200 if ok else 503)
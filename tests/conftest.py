@@ -0,0 +1,7 @@
+"""Test settings; set before any test module imports the app."""
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["CACHE_URL"] = "memory://"
+os.environ.pop("TENANCY", None)
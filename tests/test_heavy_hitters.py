@@ -0,0 +1,95 @@
+"""The top-products sketch stays within its error bound of the exact SQL totals."""
+import os
+import random
+from datetime import date, datetime, time, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import models
+from app.bootstrap import init_db
+from app.db import SessionLocal, make_engine
+from app.utils.sketches import HeavyHitters
+
+K = 16
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    engine = make_engine("sqlite:///" + os.path.join(tmp_path_factory.mktemp("hh"), "hh.db"))
+    init_db(engine, reset_jobs=False)
+    rnd = random.Random(3)
+    products = 200
+    weights = [1 / (i ** 1.1) for i in range(1, products + 1)]     # a few big sellers and a long tail
+    now = datetime.now()
+    with SessionLocal(bind=engine) as s:
+        s.execute(insert(models.Product), [
+            {"id": i, "sku": f"S{i}", "name": f"P{i}", "category": "C", "stock": 10**6, "price": 1.0}
+            for i in range(1, products + 1)
+        ])
+        s.execute(insert(models.Sale), [
+            {"product_id": pid, "qty": rnd.randint(1, 5), "unit_price": round(rnd.uniform(1, 20), 2),
+             "is_credit": False, "created_at": now - timedelta(seconds=rnd.randint(0, 90 * 86400))}
+            for pid in rnd.choices(range(1, products + 1), weights, k=20_000)
+        ])
+        # months already archived: only in the rollup, counted by the all-time totals
+        old = date.today() - timedelta(days=400)
+        s.execute(insert(models.SaleDaily), [
+            {"day": old + timedelta(days=d), "product_id": pid, "qty": 1, "revenue": rnd.uniform(1, 300)}
+            for d in range(20) for pid in rnd.sample(range(1, products + 1), 40)
+        ])
+        s.commit()
+        yield s
+    engine.dispose()
+
+
+def _exact(db, days=None):
+    s, d = models.Sale, models.SaleDaily
+    revenue = func.sum(s.qty * s.unit_price)
+    q = select(s.product_id, revenue).group_by(s.product_id)
+    if days is not None:
+        q = q.where(s.created_at >= datetime.combine(date.today() - timedelta(days=days), time.min))
+    out = {pid: float(v) for pid, v in db.execute(q)}
+    if days is None:
+        for pid, v in db.execute(select(d.product_id, func.sum(d.revenue)).group_by(d.product_id)):
+            out[pid] = out.get(pid, 0.0) + float(v)
+    return out
+
+
+def _live_sales(db, hh, n=500):
+    # sales after the seed reach the sketch as events, like with a running server
+    rnd = random.Random(5)
+    for _ in range(n):
+        sale = models.Sale(product_id=rnd.choice([1, 2, 3, 50, 150, 199]), qty=rnd.randint(1, 3),
+                           unit_price=9.5, is_credit=False, created_at=datetime.now())
+        db.add(sale)
+        db.flush()
+        hh.apply({"tenant": None, "id": sale.id, "product_id": sale.product_id, "qty": sale.qty,
+                  "revenue": sale.qty * sale.unit_price, "created_at": sale.created_at.isoformat()})
+    db.commit()
+
+
+@pytest.fixture(scope="module")
+def sketch(db):
+    hh = HeavyHitters(k=K)
+    hh.seed(db)
+    _live_sales(db, hh)
+    return hh
+
+
+@pytest.mark.parametrize("days", [None, 30], ids=["all-time", "30-days"])
+def test_estimates_bound_the_exact_totals(db, sketch, days):
+    exact = _exact(db, days)
+    top = sketch.top(10, days)
+    assert len(top) == 10
+    for pid, estimate, error in top:
+        true = exact.get(pid, 0.0)
+        assert true - 1e-6 <= estimate <= true + error + 1e-6, (pid, estimate, error, true)
+
+
+def test_all_time_reports_every_product_above_total_over_k(db, sketch):
+    exact = _exact(db)
+    reported = {pid for pid, _, _ in sketch.top(K)}
+    threshold = sum(exact.values()) / K
+    assert {pid for pid, v in exact.items() if v > threshold} <= reported
+
@@ -0,0 +1,78 @@
+"""Concurrent duplicate submissions with the same ``Idempotency-Key``."""
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.cache import MemoryCache
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+def _concurrently(n, fn):
+    start = threading.Barrier(n)
+    out = [None] * n
+
+    def worker(i):
+        start.wait()
+        out[i] = fn()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+
+def _product(client, sku, stock):
+    r = client.post("/api/v1/products/", json={"sku": sku, "name": sku, "category": "Test", "stock": stock, "price": 5.0})
+    assert r.status_code == 200
+    return r.json()["id"]
+
+
+def test_duplicate_sales_record_one_sale(client):
+    pid = _product(client, "IDEM-1", 100)
+    payload = {"product_id": pid, "qty": 3, "unit_price": 5.0, "is_credit": True, "customer_name": "Idem"}
+    responses = _concurrently(
+        20, lambda: client.post("/api/v1/sales/", json=payload, headers={"Idempotency-Key": "sale-1"})
+    )
+
+    assert [r.status_code for r in responses] == [200] * 20
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert sum(r.headers.get("Idempotent-Replayed") == "true" for r in responses) == 19
+    sales = [s for s in client.get("/api/v1/sales/").json() if s["product_id"] == pid]
+    assert len(sales) == 1
+    product = [p for p in client.get("/api/v1/products/").json() if p["id"] == pid][0]
+    assert product["stock"] == 97
+    dues = [d for d in client.get("/api/v1/dues/").json() if d["customer_name"] == "Idem"]
+    assert len(dues) == 1
+
+
+def test_duplicate_dues_create_one_due(client):
+    body = {"customer_name": "Idem due", "amount": 40.0}
+    responses = _concurrently(10, lambda: client.post("/api/v1/dues/", json=body, headers={"Idempotency-Key": "due-1"}))
+
+    assert [r.status_code for r in responses] == [200] * 10
+    assert len({r.json()["id"] for r in responses}) == 1
+    assert len([d for d in client.get("/api/v1/dues/").json() if d["customer_name"] == "Idem due"]) == 1
+
+
+def test_key_reused_with_other_body_is_rejected(client):
+    pid = _product(client, "IDEM-2", 10)
+    headers = {"Idempotency-Key": "sale-2"}
+    assert client.post("/api/v1/sales/", json={"product_id": pid, "qty": 1, "unit_price": 5.0}, headers=headers).status_code == 200
+    r = client.post("/api/v1/sales/", json={"product_id": pid, "qty": 2, "unit_price": 5.0}, headers=headers)
+    assert r.status_code == 422
+
+
+def test_memory_cache_is_bounded():
+    cache = MemoryCache(max_entries=3)
+    for i in range(5):
+        cache.set(f"k{i}", i, ttl=60)
+    assert [cache.get(f"k{i}") for i in range(5)] == [None, None, 2, 3, 4]
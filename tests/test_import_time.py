@@ -0,0 +1,16 @@
+"""Cold import of the app in lazy mode stays within budget and skips the numeric stack."""
+import json
+import os
+
+from app.cli import import_costs
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+HEAVY = ("numpy", "statsmodels")
+
+
+def test_lazy_import_is_within_budget_and_skips_numeric_stack():
+    cost, out = import_costs(
+        "app.main", lazy=True, code=f"import json, sys; print(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    )
+    assert json.loads(out) == []
+    assert cost["app.main"] <= IMPORT_BUDGET_MS, sorted(cost.items(), key=lambda kv: -kv[1])[:10]
@@ -0,0 +1,295 @@
+"""Query plan regression check: every API route against a seeded database.
+
+Every case in ``CASES`` is requested once against a freshly seeded database
+while the engine's cursor executions are recorded. Each captured statement
+is then explained, with ``EXPLAIN QUERY PLAN`` on SQLite and
+``EXPLAIN (FORMAT JSON)`` on Postgres. A case fails if:
+
+* any statement scans ``sales`` or ``dues`` instead of seeking into them,
+  unless the case lists the table in ``allow_scan``. On SQLite only
+  ``SEARCH`` passes: ``SCAN ... USING [COVERING] INDEX`` still walks the
+  whole index. On Postgres a ``Seq Scan`` fails, and so does an index scan
+  without an index condition;
+* it runs more statements than its budget in ``tests/query_budgets.json``,
+  which catches N+1 loops. ``RECORD_BUDGETS=1`` rewrites the budgets from
+  the current counts.
+
+SQLite plans from the schema alone. The seeded sizes are large enough that
+Postgres' cost-based planner prefers an index wherever one applies. A case
+must also answer with a 2xx/3xx status, so a broken case cannot pass
+silently.
+
+``PLANS_DATABASE_URL`` points the check at an empty server database (it is
+written to); the default is a temporary SQLite file.
+"""
+import json
+import os
+import random
+import re
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.bootstrap import init_db
+from app.db import SessionLocal, get_db, make_engine
+from app.utils import category_totals, holt_state, ledger, stock
+
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "query_budgets.json")
+RECORD_BUDGETS = os.getenv("RECORD_BUDGETS") == "1"
+WATCHED = ("sales", "dues")
+
+_SKIP = re.compile(r"^\s*(SAVEPOINT|RELEASE|ROLLBACK|BEGIN|COMMIT|PRAGMA|CREATE|DROP|ALTER|EXPLAIN)\b", re.I)
+_ALIAS = re.compile(r"\b(%s)\b(?:\s+AS)?\s+(\w+)" % "|".join(WATCHED), re.I)
+_NOT_ALIAS = {
+    "where", "join", "left", "inner", "outer", "cross", "on", "group", "order", "limit", "offset",
+    "union", "set", "values", "using", "natural", "having", "window", "returning", "from", "select",
+}
+
+
+@dataclass
+class Case:
+    method: str
+    path: str
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+    label: str = ""                     # tells apart cases that differ only in their body
+    allow_scan: Tuple[str, ...] = ()    # tables a full scan is expected on (say why next to the case)
+
+    @property
+    def name(self) -> str:
+        query = "&".join(f"{k}={v}" for k, v in (self.params or {}).items())
+        name = f"{self.method} {self.path}" + (f"?{query}" if query else "")
+        return f"{name} ({self.label})" if self.label else name
+
+
+# Not cases: /health and /ready never read sales or dues, and POST /api/v1/jobs/
+# runs its handler on a job thread bound to the process's own engine (the
+# handlers reuse the forecast, backtest and stock code checked below).
+CASES: List[Case] = [
+    # the unbounded export reads the whole table by design
+    Case("GET", "/api/v1/sales/", allow_scan=("sales",)),
+    Case("GET", "/api/v1/sales/", {"start": "{week_ago}"}),
+    Case("GET", "/api/v1/sales/", {"start": "{week_ago}", "fields": "id,qty,product_name", "format": "compact"}),
+    Case("POST", "/api/v1/sales/", json={"product_id": 1, "qty": 1, "unit_price": 9.5}),
+    Case("POST", "/api/v1/sales/", json={"product_id": 2, "qty": 1, "unit_price": 9.5, "is_credit": True,
+                                         "customer_name": "Customer 3"}, label="credit"),
+    # every due, open ones first
+    Case("GET", "/api/v1/dues/", allow_scan=("dues",)),
+    Case("GET", "/api/v1/dues/top-debtors"),
+    Case("GET", "/api/v1/dues/aging"),
+    Case("GET", "/api/v1/dues/customers/Customer 1"),
+    Case("GET", "/api/v1/dues/customers/Customer 1/history"),
+    Case("POST", "/api/v1/dues/", json={"customer_name": "Customer 2", "amount": 40.0}),
+    Case("PATCH", "/api/v1/dues/1", {"amount": 5}),
+    Case("POST", "/api/v1/dues/settle", json={"customer_name": "Customer 4", "amount": 25.0}),
+    Case("GET", "/api/v1/reports/summary"),
+    Case("GET", "/api/v1/reports/today"),
+    Case("GET", "/api/v1/reports/sales-series", {"days": 30}),
+    # all-time revenue per product; HEAVY_HITTERS=1 answers the default request from a sketch instead
+    Case("GET", "/api/v1/reports/top-products", {"limit": 10, "exact": "true"}, allow_scan=("sales",)),
+    Case("GET", "/api/v1/reports/category-share"),
+    Case("GET", "/api/v1/reports/category-share", {"days": 30}),
+    # newest first along the created_at indexes, stopping after `limit` rows of each
+    Case("GET", "/api/v1/reports/recent", allow_scan=("sales", "dues")),
+    Case("GET", "/api/v1/reports/metrics"),
+    Case("POST", "/api/v1/forecast/", json={"product_id": 3, "horizon_days": 7}),
+    Case("POST", "/api/v1/forecast/", json={"product_id": 3, "horizon_days": 7, "model": "holt_winters"},
+         label="holt_winters"),
+    Case("POST", "/api/v1/forecast/backtest", json={"product_ids": [3, 4], "horizon_days": 7}),
+    Case("GET", "/api/v1/products/"),
+    Case("GET", "/api/v1/products/search", {"q": "widget 1"}),
+    Case("PATCH", "/api/v1/products/4", json={"category": "Cat 9"}),
+    Case("POST", "/api/v1/products/", json={"sku": "PLANS1", "name": "Plans", "category": "Cat 1", "stock": 5}),
+    Case("PATCH", "/api/v1/products/batch", json={"items": [{"id": i, "stock": 500} for i in range(5, 25)]}),
+    Case("DELETE", "/api/v1/products/501"),
+    Case("GET", "/api/v1/stock/at", {"at": "{week_ago}"}),
+    Case("GET", "/api/v1/stock/movements", {"product_id": 1}),
+    Case("GET", "/api/v1/stock/replenishment"),
+    Case("GET", "/api/v1/stock/demand/1"),
+    Case("POST", "/api/v1/stock/restock", json={"product_id": 1, "qty": 10}),
+    Case("POST", "/api/v1/stock/snapshots"),
+    Case("GET", "/api/v1/jobs/kinds"),
+    Case("GET", "/api/v1/jobs/"),
+    Case("GET", "/api/v1/jobs/plans"),
+    Case("GET", "/api/v1/jobs/plans/result"),
+]
+
+
+def seed(db: Session, products: int = 500, sales: int = 50_000, dues: int = 5_000, days: int = 180) -> None:
+    rnd = random.Random(7)
+    now = datetime.now().replace(microsecond=0)
+    db.execute(insert(models.Product), [
+        {"id": i, "sku": f"SKU{i}", "name": f"Widget {i}", "category": f"Cat {i % 8}",
+         "stock": 10_000, "price": 9.5, "reorder_point": 20}
+        for i in range(1, products + 1)
+    ])
+    db.execute(insert(models.Sale), [
+        {"product_id": rnd.randint(1, products), "qty": rnd.randint(1, 4), "unit_price": 9.5,
+         "is_credit": False, "customer_name": None,
+         "created_at": now - timedelta(seconds=rnd.randint(0, days * 86400))}
+        for _ in range(sales)
+    ])
+    db.execute(insert(models.Due), [
+        {"customer_name": f"Customer {rnd.randint(1, 200)}", "amount": 50.0, "paid": 0.0,
+         "is_settled": rnd.random() < 0.5, "created_at": now - timedelta(days=rnd.randint(0, days))}
+        for _ in range(dues)
+    ])
+    db.add(models.Job(id="plans", kind="stock_snapshot", status="succeeded", progress=1.0, params="{}",
+                      result='{"products": %d}' % products, started_at=now, finished_at=now))
+    db.commit()
+
+
+class Capture:
+    """Statements executed on ``engine`` while ``active`` (requests run one at a time)."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: List[Tuple[str, object]] = []
+        self.active = False
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            with self._lock:
+                self.statements.append((statement, parameters))
+
+    def take(self) -> List[Tuple[str, object]]:
+        with self._lock:
+            out, self.statements = self.statements, []
+        return out
+
+    def close(self) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def _aliases(statement: str) -> Dict[str, str]:
+    names = {t: t for t in WATCHED}
+    for table, alias in _ALIAS.findall(statement):
+        if alias.lower() not in _NOT_ALIAS:
+            names[alias.lower()] = table.lower()
+    return names
+
+
+def full_scans(conn, statement: str, parameters) -> List[str]:
+    """Tables in ``WATCHED`` the statement scans (table or whole index) instead of searching."""
+    if _SKIP.match(statement):
+        return []
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        found, stack = [], [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            kind = node.get("Node Type")
+            full = kind == "Seq Scan" or (kind in ("Index Scan", "Index Only Scan") and "Index Cond" not in node)
+            if full and node.get("Relation Name") in WATCHED:
+                found.append(node["Relation Name"])
+            stack.extend(node.get("Plans", []))
+        return found
+    names = _aliases(statement)
+    found = []
+    for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+        m = re.match(r"SCAN (\w+)", row[-1])
+        if m and m.group(1).lower() in names:
+            found.append(names[m.group(1).lower()])
+    return found
+
+
+@dataclass
+class Result:
+    case: Case
+    status: int
+    statements: int
+    budget: Optional[int]
+    scans: List[Tuple[str, str]] = field(default_factory=list)     # (table, statement)
+
+    @property
+    def ok(self) -> bool:
+        over = self.budget is not None and self.statements > self.budget
+        return self.status < 400 and not self.scans and not over
+
+
+def check(client, engine, capture: Capture, case: Case, budgets: Dict[str, int]) -> Result:
+    week_ago = (datetime.now() - timedelta(days=7)).isoformat(timespec="seconds")
+    params = {k: (v.format(week_ago=week_ago) if isinstance(v, str) else v) for k, v in (case.params or {}).items()}
+    capture.take()
+    capture.active = True
+    try:
+        resp = client.request(case.method, case.path, params=params, json=case.json)
+    finally:
+        capture.active = False
+    statements = capture.take()
+    result = Result(case, resp.status_code, len(statements), budgets.get(case.name))
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            for table in full_scans(conn, statement, parameters):
+                if table not in case.allow_scan:
+                    result.scans.append((table, " ".join(statement.split())))
+    return result
+
+
+def load_budgets(path: str = BUDGETS_PATH) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_budgets(results: List[Result], path: str = BUDGETS_PATH) -> None:
+    with open(path, "w") as f:
+        json.dump({r.case.name: r.statements for r in results}, f, indent=2)
+        f.write("\n")
+
+
+@pytest.fixture(scope="module")
+def plans(tmp_path_factory):
+    from app.main import app
+
+    url = os.getenv("PLANS_DATABASE_URL") or "sqlite:///" + os.path.join(tmp_path_factory.mktemp("plans"), "plans.db")
+    engine = make_engine(url)
+    init_db(engine, reset_jobs=False)
+    with SessionLocal(bind=engine) as db:
+        seed(db, sales=int(os.getenv("PLANS_SALES", "50000")))
+        ledger.rebuild(db)
+        category_totals.rebuild(db)
+        holt_state.refit(db)
+        stock.take_snapshot(db)
+
+    def plans_db():
+        with SessionLocal(bind=engine) as db:
+            yield db
+
+    capture = Capture(engine)
+    app.dependency_overrides[get_db] = plans_db
+    results: List[Result] = []
+    try:
+        yield TestClient(app), engine, capture, ({} if RECORD_BUDGETS else load_budgets()), results
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        capture.close()
+        engine.dispose()
+    if RECORD_BUDGETS and len(results) == len(CASES):
+        save_budgets(results)
+
+
+# cases run in order against one database: later ones see the writes of earlier ones
+@pytest.mark.parametrize("case", CASES, ids=[c.name for c in CASES])
+def test_plan(plans, case):
+    client, engine, capture, budgets, results = plans
+    r = check(client, engine, capture, case, budgets)
+    results.append(r)
+    assert r.status < 400, r.status
+    assert not r.scans, "\n".join(f"scan of {table}: {statement[:200]}" for table, statement in r.scans)
+    assert r.budget is not None or RECORD_BUDGETS, "no budget recorded (run with RECORD_BUDGETS=1)"
+    assert r.budget is None or r.statements <= r.budget, f"{r.statements} statements, budget {r.budget}"